@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""
+License:
+This file is part of the 'PublicPythonProjects' distribution (https://github.com/sjoerdv or http://sjoerdv.github.io).
+Copyright (C) 2022  Sjoerd de Valk
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 3 as published by
+the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Description:
+This is the thin client of the tagging server started with 'add_keyphrases_to_jekyll_blog_post.py -s'.
+It only uses the Python standard library, so it starts in milliseconds, and sends the post to the server that keeps the NLP models warm.
+When the server is not running, it falls back to running 'add_keyphrases_to_jekyll_blog_post.py' itself.
+It is designed to work in conjunction with a VSCode 'Tasks' and accompanying 'Keyboard Shortcut' (see 'tasks.json' and 'keybindings.json').
+
+Prerequisites:
+* Python3 3.9+
+
+References:
+* http.server: https://docs.python.org/3/library/http.server.html
+
+Image Sources:
+None
+
+Tested on:
+* Linux
+** OS: LMDE 5 (elsie) x86_64
+** Kernel: 6.0.0-0.deb11.2-amd64
+** WM: Cinnamon 5.4.12
+** Python3: 3.9.2
+
+Example:
+add_keyphrases_client.py -i "/home/user/full_path_to_jekyll_site/_posts/2022-12-21-post-my-post.md"
+This will tag the post using the server specified under 'server' in the 'nlp.json' file, asking before overwriting existing tags.
+"""
+
+
+# Import modules
+from __future__ import annotations
+import sys
+import os
+import getopt
+import re
+import json
+import subprocess
+import urllib.request
+import urllib.error
+
+
+# Define functions
+def post_json(url, request, timeout):
+    """ sends a JSON request to the tagging server
+
+    Args:
+        url (str): the url of the server endpoint
+        request (dict): the request body
+        timeout (float): timeout in seconds
+
+    Returns:
+        dict: the response body
+    """
+    http_request = urllib.request.Request(
+        url, data=json.dumps(request).encode('utf-8'), headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        # Errors are reported as JSON as well
+        return json.loads(error.read())
+
+
+def run_without_server(input_file_path, force):
+    """ runs the tagging program itself, paying the full startup cost
+
+    Args:
+        input_file_path (str): path of the post
+        force (bool): tag the post even when it did not change
+
+    Returns:
+        int: exit code of the tagging program
+    """
+    print('Tagging server is not running, starting add_keyphrases_to_jekyll_blog_post.py...')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'add_keyphrases_to_jekyll_blog_post.py')
+    cmd = [sys.executable, script, '-i', input_file_path] + (['-f'] if force else [])
+    return subprocess.call(cmd)
+
+
+def main(argv):
+    """ processes the CLI input and sends the post to the tagging server
+
+    Args:
+        argv (list): CLI arguments
+    """
+    # Init Variables
+    input_file_path: str | None = None
+    force: bool = False
+    help_message: str = 'add_keyphrases_client.py -i <input_absolute_file_path> [-f]'
+
+    # Processing CLI input
+    try:
+        opts, args = getopt.getopt(argv,"hi:f",["help","in=","force"])
+    except getopt.GetoptError:
+        print(help_message)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print(help_message)
+            sys.exit()
+        elif opt in ("-i", "--in"):
+            input_file_path = str(arg)
+        elif opt in ("-f", "--force"):
+            force = True
+    if input_file_path is None:
+        print(help_message)
+        sys.exit(2)
+    if re.search(r'.md$',input_file_path) is None:
+        print('Input file is not a markdown file (with .md extension). Exiting...')
+        sys.exit(2)
+
+    # Load JSON settings
+    try:
+        with open('nlp.json', 'r',encoding='utf8') as json_data_file:
+            server_settings = json.load(json_data_file)['settings'].get('server', {})
+    except Exception as error:
+        print(error)
+        sys.exit(2)
+    url = 'http://%s:%s/tag' % (server_settings.get('host', '127.0.0.1'), server_settings.get('port', 8765))
+
+    request = {'path': os.path.abspath(input_file_path), 'overwrite': False, 'force': force}
+    try:
+        response = post_json(url, request, timeout=600)
+    except (urllib.error.URLError, ConnectionError):
+        sys.exit(run_without_server(input_file_path, force))
+
+    if response['status'] == 'tags_present':
+        overwrite = input('\r\nWARNING: Tags '+str(response['tags'])+' are already present. Do you wish to overwrite? (Y/N)')
+        if not re.match('[y]', overwrite, re.IGNORECASE):
+            return
+        request['overwrite'] = True
+        response = post_json(url, request, timeout=600)
+
+    if response['status'] == 'tagged':
+        print('PascalCase Key Phrases:', response['tags'])
+    elif response['status'] == 'unchanged':
+        print('Tags '+str(response['tags'])+' are up to date, the post did not change since it was tagged. Use -f to tag it again.')
+    else:
+        print('Tagging server error:', response.get('error'))
+        sys.exit(2)
+
+
+# Start main thread
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -25,11 +25,13 @@ An example 'keybindings.json' file is provided in the same directory of this scr
 
 Prerequisites:
 * Python3 3.9+
-* pip install markdown
-* pip install beautifulsoup4
+* pip install markdown (only for "text_cleaner": "markdown")
+* pip install beautifulsoup4 (only for "text_cleaner": "markdown")
 * pip install python-frontmatter
 * pip install keyphrase-vectorizers
 * pip install keybert
+* numpy (installed with keybert)
+* pip install sentence-transformers[onnx] (only for "embedding_backend": "onnx-int8", version 3.2+)
 
 References:
 * Workflow stuff
@@ -56,57 +58,1672 @@ Tested on:
 ** OS: Windows 10 21H2
 ** Python3: 3.9.5
 
+The post is cleaned up to plain text by a single streaming pass over the markdown source, stripping liquid tags, fenced code, footnotes and markup.
+The previous cleaner, that renders the post to HTML and parses it again with Beautiful Soup, can be selected with "text_cleaner": "markdown" in 'nlp.json'.
+Use 'benchmark_add_keyphrases.py' to compare both cleaners, the regression tests of the streaming cleaner are in 'tests' (python -m unittest discover -s tests).
+The KeyBERT model runs through full-precision PyTorch by default. With "embedding_backend": {"name": "onnx-int8"} in 'nlp.json' the same model runs through ONNX Runtime with int8 dynamic quantization,
+which is substantially faster on CPU-only machines. The model is exported locally once and cached in 'cache_dir'. Use 'benchmark_add_keyphrases.py -b backends' to compare the latency and the top-N key phrases of both backends.
+Posts longer than 'min_words' (see 'chunking' in 'nlp.json') are split into overlapping windows of 'chunk_words' words, because the transformer truncates long documents
+and spaCy would hold the parse of the whole post in memory. The chunks are parsed and embedded 'chunk_batch_size' at a time, the candidate key phrases of all chunks are ranked
+by their cosine similarity with the mean of the chunk embeddings. The memory use is bounded by the batch of chunks, regardless of the length of the post.
+
 Example:
 add_keyphrases_to_jekyll_blog_post.py -i "/home/user/full_path_to_jekyll_site/_posts/2022-12-21-post-my-post.md"
 This will start the process of adding keywords to the YAML frontmatter of the post using the settings specified in the 'nlp.json' file.
+add_keyphrases_to_jekyll_blog_post.py -d "/home/user/full_path_to_jekyll_site/_posts"
+This will add keywords to every markdown post in the directory (recursively), loading the NLP models only once. A glob like "/home/user/full_path_to_jekyll_site/_posts/2022-*.md" can be used instead of a directory.
+Posts that already have tags are skipped, unless '-y' (or '--yes') is given to overwrite them without asking. A summary per file is shown at the end.
+In this mode the posts are sent to the models in batches of 'batch_size' posts (see 'nlp.json'), which is far cheaper per post. The throughput (docs/sec) is reported.
+When 'embedding_cache' is enabled in 'nlp.json', the embeddings of documents and candidate key phrases are cached in a SQLite database,
+so re-tagging a site after a small edit only embeds the new phrases. The least recently used embeddings above 'max_entries' are evicted while the cache is in use (and when it is closed).
+When 'tagging_state' is enabled in 'nlp.json', a hash of the plain text of every tagged post is stored together with a fingerprint of the NLP settings.
+Posts with tags whose plain text and settings did not change since they were tagged are skipped (also by '-i'), which makes re-tagging a whole site near-instant. Use '-f' (or '--force') to tag them anyway.
+The new tags are written by only patching the 'tags' key in the YAML frontmatter, the other keys (and their order) and the body are left untouched.
+The post is replaced in one go by a temporary file, so it is never left truncated when the process dies mid-write.
+When 'tag_index' is enabled in 'nlp.json', an index of all tags used across the site with their embeddings is kept (and built from the posts in directory mode).
+New key phrases are snapped to the nearest existing tag when their cosine similarity is at least 'similarity_threshold', so near-duplicates like 'GithubPages' and 'GithubPage' are avoided.
+add_keyphrases_to_jekyll_blog_post.py -d "/home/user/full_path_to_jekyll_site/_posts" -y -w 16
+This will fan the batches of posts out across 16 worker processes (ie. the number of CPU cores), each loading the models once. The tags are written by the main process.
+add_keyphrases_to_jekyll_blog_post.py -d "/home/user/full_path_to_jekyll_site/_posts" -y -f -p profile.json --cprofile profile.prof
+This will record the wall time, CPU time, process peak RSS (and how much the stage raised it) of every stage
+(read, clean, load_models, extract, embed, snap/pascal_case, write, and markdown/html_to_text within 'clean' for the 'markdown' text cleaner) per post or batch
+and write them with the totals per stage and the model settings to 'profile.json' (or CSV when the file name ends with '.csv'). The optional cProfile dump can be inspected with 'python3 -m pstats profile.prof'.
+The 'embed' stage is the time spent in the embedding model, the rest of 'extract' is mostly spaCy POS tagging in the vectorizer.
+add_keyphrases_to_jekyll_blog_post.py -s
+This will start a long-lived tagging server on localhost (see 'server' in 'nlp.json') that keeps the models warm. It only tags posts within 'site_root' and only accepts JSON requests.
+The thin client 'add_keyphrases_client.py' sends the posts to it,
+so tagging a post takes tens of milliseconds after the first request instead of paying the interpreter startup, imports and model load on every run.
+The example 'tasks.json' starts the server when the folder is opened and lets the 'add_keywords' task call the client.
 """
 
 
 # Import modules
 from __future__ import annotations
 import sys
+import os
 import getopt
+import glob
 import re
 import json
-from io import BytesIO
-from markdown import markdown
-from bs4 import BeautifulSoup
-import frontmatter
-from keyphrase_vectorizers import KeyphraseCountVectorizer
-from keybert import KeyBERT
+import time
+import sqlite3
+import hashlib
+import unicodedata
+import html
+import io
+import shutil
+import tempfile
+import csv
+import contextlib
+# NOTE: The heavy modules (numpy, markdown, bs4, frontmatter, keyphrase_vectorizers and keybert, which imports torch)
+# are imported where they are used, so '-h', argument validation and skipping unchanged posts start fast.
+# The same goes for http.server and concurrent.futures, which are only needed by '-s' and '-d'. See 'tests/test_import_time.py'.
+
+
+# Define constants
+SETTINGS_FILE_NAME = 'nlp.json'
+# Same components KeyphraseCountVectorizer excludes when it loads the spaCy pipeline by name
+DEFAULT_SPACY_EXCLUDE = ['parser', 'attribute_ruler', 'lemmatizer', 'ner', 'textcat']
+# Settings that influence the resulting tags, a change in these forces the posts to be tagged again
+FINGERPRINT_SETTINGS = ('nlp_models', 'key_phrase_output_count', 'text_cleaner', 'embedding_backend', 'tag_index', 'chunking')
+# The top-level 'tags' key in the YAML frontmatter (see 'write_post')
+TAGS_KEY_PATTERN = re.compile(rb'tags\s*:')
+# Markdown cleaning patterns (see 'iter_clean_lines')
+FENCE_START_PATTERN = re.compile(r'^\s*(?:(?P<fence>`{3,}|~{3,})|{%-?\s*(?P<liquid_block>highlight|comment|raw)\b.*?%})')
+SKIP_LINE_PATTERN = re.compile(r'^(?:\s{0,3}\[[^\]^]+\]:\s*\S+.*|\s*(?:[-*_]\s*){3,}|\s*=+\s*)$')
+BLOCK_MARKUP_PATTERN = re.compile(r'^\s*(?:(?:>\s?)+)?(?:#{1,6}\s+|[-*+]\s+|\d+[.)]\s+)?')
+INLINE_MARKUP_PATTERN = re.compile(
+    r'{%-?\s*(?P<liquid_block>highlight|comment|raw)\b.*?%}.*?{%-?\s*end(?P=liquid_block)\s*-?%}'  # one-line liquid blocks
+    r'|{{.*?}}|{%.*?%}'                                                                      # liquid tags
+    r'|\[\^[^\]]+\](?::\s?)?'                                                                # footnote references and definitions
+    r'|\[(?P<link_text>(?:[^\[\]]|!\[[^\]]*\]\([^)]*\))*)\](?:\([^)]*\)|\[[^\]]*\])'         # links, possibly around an image
+    r'|!\[[^\]]*\]\([^)]*\)'                                                                 # images, rendered without text
+    r'|(?P<code_ticks>`+)(?P<code_text>.+?)(?P=code_ticks)'                                  # inline code
+    r'|<!--.*?-->|</?[A-Za-z][^>]*>'                                                         # html
+    r'|\*+|(?<![A-Za-z0-9])_+|_+(?![A-Za-z0-9])|~~|\s#+\s*$'                                 # emphasis and closing heading hashes
+)
+
+
+# Define global variables
+## Set in every worker process of the pool (see '--workers')
+WORKER_SETTINGS: dict | None = None
+WORKER_MODELS: tuple | None = None
+## Set by '--profile'
+PROFILER: StageProfiler | None = None
+
+
+# Define classes
+class EmbeddingCache:
+    """ persistent SQLite store of embeddings, keyed by model name + normalized text hash,
+    with size-bounded LRU eviction and hit/miss statistics
+    """
+    def __init__(self, path, model_name, max_entries):
+        """ opens (or creates) the SQLite store
+
+        Args:
+            path (str): path of the SQLite database file
+            model_name (str): name of the embedding model, part of every key
+            max_entries (int): maximum number of embeddings kept after eviction
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        # Evict once the store grows this far over 'max_entries', so a long run (or the server) does not evict on every insert
+        self.eviction_margin = max(100, max_entries // 10)
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+        self.connection.commit()
+        self.entries = self.connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def key(self, text):
+        """ computes the cache key of a text
+
+        Args:
+            text (str): document or key phrase
+
+        Returns:
+            str: hex digest of the model name and the normalized text
+        """
+        normalized_text = ' '.join(unicodedata.normalize('NFC', str(text)).split())
+        return hashlib.sha256((self.model_name + '\n' + normalized_text).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """ fetches the cached embeddings and marks them as recently used
+
+        Args:
+            keys (list): cache keys
+
+        Returns:
+            dict: key to embedding (numpy array) for the keys that were found
+        """
+        import numpy as np
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below the SQLite limit of host parameters per statement
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            rows = self.connection.execute(
+                'SELECT key, vector FROM embeddings WHERE key IN (' + ','.join('?' * len(chunk)) + ')', chunk)
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+        if found:
+            now = time.time()
+            self.connection.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?', [(now, key) for key in found])
+            self.connection.commit()
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """ stores embeddings, evicting the least recently used ones when the store grew over 'max_entries' by the eviction margin
+
+        Args:
+            items (iterable): (key, embedding) tuples
+        """
+        import numpy as np
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items]
+        self.connection.executemany('INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)', rows)
+        self.connection.commit()
+        # An upper bound: replaced rows and rows added by other processes are corrected by the count in 'evict'
+        self.entries += len(rows)
+        if self.entries > self.max_entries + self.eviction_margin:
+            self.evict()
+
+    def evict(self):
+        """ removes the least recently used embeddings above 'max_entries'
+
+        Returns:
+            int: number of evicted embeddings
+        """
+        count = self.connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        self.entries = min(count, self.max_entries)
+        if count <= self.max_entries:
+            return 0
+        self.connection.execute(
+            'DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)', (count - self.max_entries,))
+        self.connection.commit()
+        return count - self.max_entries
+
+    def stats(self):
+        """ returns the cache statistics
+
+        Returns:
+            dict: hits, misses, hit ratio and number of cached embeddings
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': self.connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        }
+
+    def close(self):
+        """ evicts the least recently used embeddings and closes the database
+        """
+        self.evict()
+        self.connection.close()
+
+
+class CachedEmbedder:
+    """ wraps a KeyBERT embedding backend and consults the EmbeddingCache before calling the model
+    """
+    def __init__(self, embedder, cache):
+        """ wraps the embedding backend
+
+        Args:
+            embedder (keybert.backend.BaseEmbedder): the backend that computes missing embeddings
+            cache (EmbeddingCache): the embedding cache
+        """
+        self.embedder = embedder
+        self.cache = cache
+
+    def embed(self, documents, verbose=False):
+        """ embeds documents or key phrases, only the texts that are not cached are sent to the model
+
+        Args:
+            documents (list): texts to embed
+            verbose (bool, optional): passed on to the backend. Defaults to False.
+
+        Returns:
+            numpy.ndarray: one embedding per text
+        """
+        import numpy as np
+        documents = list(documents)
+        if not documents:
+            return self.embedder.embed(documents, verbose)
+        keys = [self.cache.key(document) for document in documents]
+        embeddings = self.cache.get_many(keys)
+        missing = {}
+        for key, document in zip(keys, documents):
+            if key not in embeddings:
+                missing[key] = document
+        if missing:
+            new_embeddings = self.embedder.embed(list(missing.values()), verbose)
+            self.cache.put_many(zip(missing.keys(), new_embeddings))
+            for key, embedding in zip(missing.keys(), new_embeddings):
+                embeddings[key] = np.asarray(embedding, dtype=np.float32)
+        return np.vstack([embeddings[key] for key in keys])
+
+
+class StageProfiler:
+    """ records the wall time, CPU time and memory of every stage of the pipeline per document (see '--profile').
+    The peak RSS of the process never goes down, so every stage records the peak after the stage ('process_peak_rss_mb')
+    and how much the stage raised it ('peak_rss_growth_mb'), which points at the stages and posts that need the memory
+    """
+    def __init__(self):
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, stage, document, documents=1):
+        """ measures a stage
+
+        Args:
+            stage (str): name of the stage, ie. 'clean'
+            document (str): path of the post, or a description of the batch
+            documents (int, optional): number of documents processed in the stage. Defaults to 1.
+        """
+        wall_start, cpu_start, peak_rss_start = time.perf_counter(), time.process_time(), peak_rss_mb()
+        try:
+            yield
+        finally:
+            peak_rss = peak_rss_mb()
+            self.records.append({
+                'stage': stage,
+                'document': document,
+                'documents': documents,
+                'wall_seconds': round(time.perf_counter() - wall_start, 6),
+                'cpu_seconds': round(time.process_time() - cpu_start, 6),
+                'process_peak_rss_mb': peak_rss,
+                'peak_rss_growth_mb': round(peak_rss - peak_rss_start, 1) if peak_rss is not None else None})
+
+    def totals(self):
+        """ sums the records per stage
+
+        Returns:
+            dict: stage to its total 'wall_seconds', 'cpu_seconds' and 'documents'
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'documents': 0})
+            total['wall_seconds'] = round(total['wall_seconds'] + record['wall_seconds'], 6)
+            total['cpu_seconds'] = round(total['cpu_seconds'] + record['cpu_seconds'], 6)
+            total['documents'] += record['documents']
+        return totals
+
+    def write_report(self, report_path, settings):
+        """ writes the records as CSV (when the path ends with .csv) or as JSON, including the model settings and totals per stage
+
+        Args:
+            report_path (str): path of the report
+            settings (dict): the NLP settings, the model versions are part of the JSON report
+        """
+        if report_path.endswith('.csv'):
+            with open(report_path, 'w', encoding='utf8', newline='') as report_file:
+                writer = csv.DictWriter(report_file, fieldnames=[
+                    'stage', 'document', 'documents', 'wall_seconds', 'cpu_seconds', 'process_peak_rss_mb', 'peak_rss_growth_mb'])
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(report_path, 'w', encoding='utf8') as report_file:
+                json.dump({
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'settings': {key: settings.get(key) for key in FINGERPRINT_SETTINGS},
+                    'process_peak_rss_mb': peak_rss_mb(),
+                    'totals': self.totals(),
+                    'records': self.records}, report_file, indent=1)
+        print('\r\nProfile report written to:', report_path)
+        for stage, total in self.totals().items():
+            print(f"{stage}: {total['wall_seconds']:.3f}s wall, {total['cpu_seconds']:.3f}s CPU, {total['documents']} documents")
+
+
+class ProfiledEmbedder:
+    """ wraps a KeyBERT embedding backend and records the time spent in the embedding model as the 'embed' stage
+    """
+    def __init__(self, embedder):
+        """ wraps the embedding backend
+
+        Args:
+            embedder (keybert.backend.BaseEmbedder): the embedding backend
+        """
+        self.embedder = embedder
+
+    def embed(self, documents, verbose=False):
+        """ embeds documents or key phrases
+
+        Args:
+            documents (list): texts to embed
+            verbose (bool, optional): passed on to the backend. Defaults to False.
+
+        Returns:
+            numpy.ndarray: one embedding per text
+        """
+        with profile_stage('embed', f'{len(documents)} texts', len(documents)):
+            return self.embedder.embed(documents, verbose)
+
+
+class TagIndex:
+    """ persistent index of the tags used across the site with their normalized embeddings.
+    New key phrases are snapped to the nearest existing tag (cosine similarity) before falling back to a new tag.
+    """
+    def __init__(self, path, model_name, threshold):
+        """ loads the index, or starts an empty one when the file is missing or was built with another model
+
+        Args:
+            path (str): path of the index file (.npz)
+            model_name (str): name of the embedding model, the index is rebuilt when it changes
+            threshold (float): minimum cosine similarity to snap a key phrase to an existing tag
+        """
+        import numpy as np
+        self.path = path
+        self.model_name = model_name
+        self.threshold = threshold
+        self.tags = []
+        self.positions = {}
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as index_file:
+                if str(index_file['model_name']) == model_name:
+                    self.add([str(tag) for tag in index_file['tags']], index_file['vectors'])
+
+    def __len__(self):
+        return len(self.tags)
+
+    def missing(self, tags):
+        """ returns the tags that are not in the index yet
+
+        Args:
+            tags (iterable): tags
+
+        Returns:
+            list: the tags that are not in the index
+        """
+        return [tag for tag in dict.fromkeys(tags) if tag not in self.positions]
+
+    def add(self, tags, vectors):
+        """ adds tags with their embeddings, the storage grows by doubling so adding stays cheap for large indexes
+
+        Args:
+            tags (list): tags
+            vectors (numpy.ndarray): one embedding per tag
+        """
+        import numpy as np
+        if len(tags) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(tags), -1)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        size = len(self.tags)
+        if self.matrix.shape[0] < size + len(tags):
+            matrix = np.empty((max(2 * self.matrix.shape[0], size + len(tags), 1024), vectors.shape[1]), dtype=np.float32)
+            if size > 0:
+                matrix[:size] = self.matrix[:size]
+            self.matrix = matrix
+        self.matrix[size:size + len(tags)] = vectors
+        for tag in tags:
+            self.positions[tag] = len(self.tags)
+            self.tags.append(tag)
+
+    def snap(self, keyphrases, vectors):
+        """ turns the key phrases of a post into tags, snapping them to the nearest existing tag
+
+        Args:
+            keyphrases (list): (key phrase, score) tuples of a post
+            vectors (numpy.ndarray): one embedding per key phrase
+
+        Returns:
+            list: PascalCase tags, without duplicates
+        """
+        import numpy as np
+        tags = []
+        if len(keyphrases) == 0:
+            return tags
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keyphrases), -1)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        nearest, similarities = None, None
+        if self.tags:
+            # One matrix product for all key phrases of the post
+            similarity_matrix = vectors @ self.matrix[:len(self.tags)].T
+            nearest = similarity_matrix.argmax(axis=1)
+            similarities = similarity_matrix[np.arange(len(keyphrases)), nearest]
+        for position, (keyphrase, _) in enumerate(keyphrases):
+            tag = to_pascal_case(keyphrase)
+            if tag not in self.positions:
+                if nearest is not None and similarities[position] >= self.threshold:
+                    tag = self.tags[nearest[position]]
+                else:
+                    self.add([tag], vectors[position:position + 1])
+            if tag not in tags:
+                tags.append(tag)
+        return tags
+
+    def save(self):
+        """ saves the index, replacing the previous file in one go
+        """
+        import numpy as np
+        with open(self.path + '.tmp', 'wb') as index_file:
+            np.savez(index_file, model_name=np.array(self.model_name), tags=np.array(self.tags, dtype=str),
+                     vectors=self.matrix[:len(self.tags)])
+        os.replace(self.path + '.tmp', self.path)
 
 
 # Define functions
-def md_to_text(md_text):
-    """_summary_
+def peak_rss_mb():
+    """ returns the peak resident set size of this process
+
+    Returns:
+        float: peak RSS in megabytes, None when unavailable (ie. on Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def profile_stage(stage, document, documents=1):
+    """ measures a stage when profiling is enabled
+
+    Args:
+        stage (str): name of the stage, ie. 'clean'
+        document (str): path of the post, or a description of the batch
+        documents (int, optional): number of documents processed in the stage. Defaults to 1.
+
+    Returns:
+        contextmanager: the measuring context, or a context that does nothing when profiling is disabled
+    """
+    if PROFILER is None:
+        return contextlib.nullcontext()
+    return PROFILER.stage(stage, document, documents)
+
+
+def md_to_text(md_text, document='-'):
+    """ renders the markdown to HTML and returns the text of the HTML
+
+    Args:
+        md_text (str): the markdown content of the post (without frontmatter)
+        document (str, optional): path of the post, for the profiler. Defaults to '-'.
+
+    Returns:
+        str: the text of the rendered HTML
+    """
+    from markdown import markdown
+    from bs4 import BeautifulSoup
+    with profile_stage('markdown', document):
+        html_text = markdown(md_text)
+    with profile_stage('html_to_text', document):
+        soup = BeautifulSoup(html_text, features='lxml')
+        return soup.get_text()
+
+
+def clean_post_text_legacy(md_text, document='-'):
+    """ cleans up the markdown Jekyll document to plain text by rendering it to HTML and parsing that again ('text_cleaner': 'markdown')
+
+    Args:
+        md_text (str): the markdown content of the post (without frontmatter)
+        document (str, optional): path of the post, for the profiler. Defaults to '-'.
+
+    Returns:
+        str: plain text
+    """
+    plain_text_md = md_to_text(md_text, document)
+    plain_text_md = re.sub(r"{{.*}}", '', plain_text_md)
+    plain_text_md = re.sub(r"{%.*%}", '', plain_text_md)
+    plain_text_md = re.sub(r"(\[\^\d+\](:\s)?)", '', plain_text_md)
+    plain_text_md = re.sub(r"\[(.*)\]:\s", r"\1: ", plain_text_md)
+    plain_text_md = re.sub(r"```.*```", '', plain_text_md, flags=re.S)
+    return plain_text_md
+
+
+def replace_inline_markup(match):
+    """ replaces an inline markup match of INLINE_MARKUP_PATTERN by its plain text
 
     Args:
-        md (_type_): _description_
+        match (re.Match): the match
 
     Returns:
-        _type_: _description_
+        str: plain text
     """
-    html = markdown(md_text)
-    soup = BeautifulSoup(html, features='lxml')
-    return soup.get_text()
+    if match.group('link_text') is not None:
+        return INLINE_MARKUP_PATTERN.sub(replace_inline_markup, match.group('link_text'))
+    if match.group('code_text') is not None:
+        return match.group('code_text')
+    return ''
+
+
+def iter_clean_lines(md_lines):
+    """ strips liquid tags, fenced code, footnotes and markup from markdown lines in one streaming pass
+
+    Args:
+        md_lines (iterable): markdown lines, ie. an open file or a list of lines
+
+    Yields:
+        str: plain text line
+    """
+    fence = None
+    for md_line in md_lines:
+        md_line = md_line.rstrip('\r\n')
+        # Skip fenced code blocks, including liquid highlight and comment blocks
+        if fence is not None:
+            if fence.match(md_line):
+                fence = None
+            continue
+        fence_match = FENCE_START_PATTERN.match(md_line)
+        if fence_match is not None:
+            if fence_match.group('fence') is not None:
+                fence = re.compile(r'^\s*' + re.escape(fence_match.group('fence')[0]) + '{' + str(len(fence_match.group('fence'))) + r',}\s*$')
+                continue
+            fence = re.compile(r'.*{%-?\s*end' + fence_match.group('liquid_block') + r'\s*-?%}')
+            if fence.match(md_line, fence_match.end()) is None:
+                continue
+            # A one-line liquid block, stripped with the inline markup below
+            fence = None
+        # Skip lines that render to nothing: link reference definitions, horizontal rules and setext underlines
+        if SKIP_LINE_PATTERN.match(md_line):
+            continue
+        md_line = BLOCK_MARKUP_PATTERN.sub('', md_line, count=1)
+        md_line = INLINE_MARKUP_PATTERN.sub(replace_inline_markup, md_line)
+        yield html.unescape(md_line)
+
+
+def clean_markdown(md_text):
+    """ cleans up the markdown Jekyll document to plain text in one streaming pass over the markdown source ('text_cleaner': 'streaming')
+
+    Args:
+        md_text (str): the markdown content of the post (without frontmatter)
+
+    Returns:
+        str: plain text
+    """
+    return '\n'.join(iter_clean_lines(io.StringIO(md_text)))
+
+
+def clean_post_text(md_text, text_cleaner='streaming', document='-'):
+    """ cleans up the markdown Jekyll document to plain text, without liquid tags, footnotes and code blocks
+
+    Args:
+        md_text (str): the markdown content of the post (without frontmatter)
+        text_cleaner (str, optional): 'streaming' or the legacy 'markdown' (HTML rendering) cleaner. Defaults to 'streaming'.
+        document (str, optional): path of the post, the profiler attributes the stages of the 'markdown' cleaner to it. Defaults to '-'.
+
+    Returns:
+        str: plain text
+    """
+    if text_cleaner == 'markdown':
+        return clean_post_text_legacy(md_text, document)
+    return clean_markdown(md_text)
+
+
+def load_settings(settings_file_name=SETTINGS_FILE_NAME):
+    """ loads the NLP settings from the JSON settings file
+
+    Args:
+        settings_file_name (str, optional): path to the settings file. Defaults to 'nlp.json'.
+
+    Returns:
+        dict: the 'settings' element of the JSON settings file
+    """
+    with open(settings_file_name, 'r',encoding='utf8') as json_data_file:
+        json_object = json.load(json_data_file)
+    settings = json_object['settings']
+    # Fail early on incomplete settings
+    settings['key_phrase_output_count'] = int(settings['key_phrase_output_count'])
+    settings['batch_size'] = max(1, int(settings.get('batch_size', 1)))
+    settings['text_cleaner'] = settings.get('text_cleaner', 'streaming')
+    for nlp_model in settings['nlp_models'][:2]:
+        if not isinstance(nlp_model['arguments'], dict):
+            raise ValueError(f"'arguments' of '{nlp_model['name']}' should be an object")
+    return settings
+
+
+def open_embedding_cache(settings):
+    """ opens the embedding cache when it is enabled in the settings
+
+    Args:
+        settings (dict): the NLP settings
+
+    Returns:
+        EmbeddingCache: the embedding cache, None when disabled
+    """
+    cache_settings = settings.get('embedding_cache', {})
+    if not cache_settings.get('enabled', False):
+        return None
+    return EmbeddingCache(
+        cache_settings.get('path', 'embedding_cache.sqlite3'),
+        embedding_model_name(settings),
+        int(cache_settings.get('max_entries', 500000)))
+
+
+def embedding_model_name(settings):
+    """ returns the name of the embedding model including its backend, quantized models produce (slightly) different embeddings
+
+    Args:
+        settings (dict): the NLP settings
+
+    Returns:
+        str: ie. 'all-MiniLM-L6-v2' or 'all-MiniLM-L6-v2@onnx-int8-avx2'
+    """
+    model_name = str(settings['nlp_models'][1]['arguments'].get('model', ''))
+    backend_settings = settings.get('embedding_backend', {})
+    if backend_settings.get('name', 'torch') == 'onnx-int8':
+        return model_name + '@onnx-int8-' + backend_settings.get('quantization', 'avx2')
+    return model_name
+
+
+def load_onnx_model(model_name, backend_settings):
+    """ loads the sentence-transformers model through ONNX Runtime with int8 dynamic quantization.
+    The model is exported and quantized once, the result is cached in 'cache_dir'.
+
+    Args:
+        model_name (str): name of the sentence-transformers model, ie. 'all-MiniLM-L6-v2'
+        backend_settings (dict): the 'embedding_backend' settings ('quantization': 'arm64', 'avx2', 'avx512' or 'avx512_vnni')
+
+    Returns:
+        SentenceTransformer: the quantized model
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    quantization = backend_settings.get('quantization', 'avx2')
+    model_dir = os.path.join(backend_settings.get('cache_dir', 'onnx_models'), model_name.replace('/', '__'))
+    file_name = f'model_qint8_{quantization}.onnx'
+    if not os.path.exists(os.path.join(model_dir, 'onnx', file_name)):
+        print(f'Exporting {model_name} to ONNX with {quantization} int8 quantization (only once)...')
+        model = SentenceTransformer(model_name, backend='onnx')
+        model.save_pretrained(model_dir)
+        export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+    return SentenceTransformer(model_dir, backend='onnx', model_kwargs={'file_name': 'onnx/' + file_name})
+
+
+def load_models(settings, verbose=True):
+    """ initializes the KeyphraseCountVectorizer and KeyBERT models. Do this once and reuse the result for every post.
+
+    Args:
+        settings (dict): the NLP settings
+        verbose (bool, optional): print the model arguments. Defaults to True.
+
+    Returns:
+        tuple: (vectorizer, kw_model)
+    """
+    with profile_stage('load_models', '-', 0):
+        return load_models_unprofiled(settings, verbose)
+
+
+def load_models_unprofiled(settings, verbose):
+    """ initializes the KeyphraseCountVectorizer and KeyBERT models (see 'load_models')
+
+    Args:
+        settings (dict): the NLP settings
+        verbose (bool): print the model arguments
+
+    Returns:
+        tuple: (vectorizer, kw_model)
+    """
+    from keyphrase_vectorizers import KeyphraseCountVectorizer
+    from keybert import KeyBERT
+    keyphrase_count_vectorizer_args = dict(settings['nlp_models'][0]['arguments'])
+    keybert_args = dict(settings['nlp_models'][1]['arguments'])
+    if verbose:
+        print(keyphrase_count_vectorizer_args)
+        print(keybert_args)
+
+    # Init default vectorizer
+    try:
+        # Load the spaCy pipeline once, otherwise the vectorizer loads it again on every fit
+        spacy_pipeline = keyphrase_count_vectorizer_args.get('spacy_pipeline', 'en_core_web_sm')
+        if isinstance(spacy_pipeline, str):
+            import spacy
+            keyphrase_count_vectorizer_args['spacy_pipeline'] = spacy.load(
+                spacy_pipeline, exclude=keyphrase_count_vectorizer_args.get('spacy_exclude', DEFAULT_SPACY_EXCLUDE))
+        vectorizer = KeyphraseCountVectorizer(**keyphrase_count_vectorizer_args)
+    except Exception as error:
+        print("KeyphraseCountVectorizer error:", error)
+        sys.exit(2)
+
+    # Init KeyBERT
+    try:
+        backend_settings = settings.get('embedding_backend', {})
+        if backend_settings.get('name', 'torch') == 'onnx-int8':
+            keybert_args['model'] = load_onnx_model(keybert_args['model'], backend_settings)
+        kw_model = KeyBERT(**keybert_args)
+    except Exception as error:
+        print("KeyBERT error:", error)
+        sys.exit(2)
+
+    # Time the embedding model itself, apart from the rest of the extraction (and the embedding cache)
+    if PROFILER is not None:
+        kw_model.model = ProfiledEmbedder(kw_model.model)
+
+    # Consult the embedding cache before calling the embedding model
+    cache = open_embedding_cache(settings)
+    if cache is not None:
+        kw_model.model = CachedEmbedder(kw_model.model, cache)
+
+    return vectorizer, kw_model
+
+
+def close_models(kw_model):
+    """ closes the embedding cache (if any) and prints its statistics
+
+    Args:
+        kw_model (KeyBERT): the KeyBERT model
+    """
+    if isinstance(kw_model.model, CachedEmbedder):
+        print('\r\nEmbedding cache:', kw_model.model.cache.stats())
+        kw_model.model.cache.close()
+
+
+def to_pascal_case(keyphrase):
+    """ transforms a key phrase to PascalCase
+
+    Args:
+        keyphrase (str): key phrase, ie. 'github pages'
+
+    Returns:
+        str: PascalCase key phrase, ie. 'GithubPages'
+    """
+    return ''.join(x for x in keyphrase.title() if not x.isspace())
+
+
+def extract_keyphrases(docs, vectorizer, kw_model, numberof_phrases, chunking=None):
+    """ extracts the key phrases from a batch of plain text documents in one KeyBERT call,
+    so the candidate key phrases and documents are embedded in bulk
+
+    Args:
+        docs (list): the cleaned up plain text of the posts
+        vectorizer (KeyphraseCountVectorizer): the vectorizer deciding on candidate key phrases
+        kw_model (KeyBERT): the KeyBERT model
+        numberof_phrases (int): number of key phrases to return per document
+        chunking (dict, optional): the 'chunking' settings, documents longer than 'min_words' are extracted in chunks. Defaults to None.
+
+    Returns:
+        list: a list of (key phrase, score) tuples per document
+    """
+    keyphrases = [None] * len(docs)
+    if chunking is not None and chunking.get('enabled', False):
+        min_words = int(chunking.get('min_words', 2000))
+        for number, doc in enumerate(docs):
+            words = doc.split()
+            if len(words) > min_words:
+                keyphrases[number] = extract_keyphrases_chunked(words, vectorizer, kw_model, numberof_phrases, chunking)
+    short_numbers = [number for number, doc_keyphrases in enumerate(keyphrases) if doc_keyphrases is None]
+    if not short_numbers:
+        return keyphrases
+
+    # Use keyphrase vectorizer to decide on suitable keyphrases
+    # KeyBERT fits the vectorizer itself, so there is no need to fit it upfront (that would parse the documents twice).
+    # adding ', use_mmr=True, diversity=0.3' to the settings and varying the diversity may prove useful at some point.
+    short_docs = [docs[number] for number in short_numbers]
+    short_keyphrases = kw_model.extract_keywords(docs=short_docs, top_n=numberof_phrases, vectorizer=vectorizer)
+    # KeyBERT returns a flat list for a single document
+    if len(short_docs) == 1:
+        short_keyphrases = [short_keyphrases]
+    for number, doc_keyphrases in zip(short_numbers, short_keyphrases):
+        keyphrases[number] = doc_keyphrases
+    return keyphrases
+
+
+def iter_chunks(words, chunk_words, overlap_words):
+    """ yields overlapping windows of words
+
+    Args:
+        words (list): the words of the document
+        chunk_words (int): number of words per chunk
+        overlap_words (int): number of words a chunk shares with the previous chunk
+
+    Yields:
+        str: the text of a chunk
+    """
+    step = max(1, chunk_words - overlap_words)
+    for start in range(0, max(1, len(words) - overlap_words), step):
+        yield ' '.join(words[start:start + chunk_words])
+
+
+def extract_keyphrases_chunked(words, vectorizer, kw_model, numberof_phrases, chunking):
+    """ extracts the key phrases of a long document in overlapping chunks ('chunking' in 'nlp.json'),
+    so neither spaCy nor the transformer ever sees more than 'chunk_batch_size' chunks at a time.
+    The candidate key phrases are the union of the candidates of all chunks, the document vector is the mean of the chunk embeddings
+    and the candidates are ranked by their cosine similarity with it, as KeyBERT does for a whole document.
+
+    Args:
+        words (list): the words of the cleaned up plain text of the post
+        vectorizer (KeyphraseCountVectorizer): the vectorizer deciding on candidate key phrases
+        kw_model (KeyBERT): the KeyBERT model
+        numberof_phrases (int): number of key phrases to return
+        chunking (dict): the 'chunking' settings
+
+    Returns:
+        list: (key phrase, score) tuples
+    """
+    import numpy as np
+    chunk_words = max(1, int(chunking.get('chunk_words', 256)))
+    overlap_words = min(chunk_words - 1, max(0, int(chunking.get('overlap_words', 32))))
+    chunk_batch_size = max(1, int(chunking.get('chunk_batch_size', 16)))
+    embed = kw_model.model.embed
+
+    candidates = set()
+    vector_sum = None
+    chunk_count = 0
+    batch = []
+    chunks = iter_chunks(words, chunk_words, overlap_words)
+    while True:
+        chunk = next(chunks, None)
+        if chunk is not None:
+            batch.append(chunk)
+        if batch and (chunk is None or len(batch) == chunk_batch_size):
+            # Only the candidates and the running sum of the chunk embeddings are kept between batches
+            try:
+                candidates.update(str(candidate) for candidate in vectorizer.fit(batch).get_feature_names_out())
+            except ValueError:
+                # No candidate key phrases in these chunks
+                pass
+            embeddings = np.asarray(embed(batch), dtype=np.float32)
+            vector_sum = embeddings.sum(axis=0) if vector_sum is None else vector_sum + embeddings.sum(axis=0)
+            chunk_count += len(batch)
+            batch = []
+        if chunk is None:
+            break
+    if not candidates or vector_sum is None:
+        return []
+
+    doc_vector = vector_sum / chunk_count
+    doc_vector = doc_vector / max(float(np.linalg.norm(doc_vector)), 1e-12)
+    candidates = sorted(candidates)
+    similarities = np.empty(len(candidates), dtype=np.float32)
+    for start in range(0, len(candidates), chunk_batch_size * 16):
+        vectors = np.asarray(embed(candidates[start:start + chunk_batch_size * 16]), dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        similarities[start:start + len(vectors)] = vectors @ doc_vector
+    top = np.argsort(-similarities)[:numberof_phrases]
+    return [(candidates[number], round(float(similarities[number]), 4)) for number in top]
+
+
+def keyphrases_to_tags(batch_keyphrases, embed, tag_index):
+    """ transforms the key phrases to PascalCase tags, snapping them to the tag index when enabled
+
+    Args:
+        batch_keyphrases (list): a list of (key phrase, score) tuples per post
+        embed (function): embeds a list of key phrases, ie. kw_model.model.embed. Or a numpy.ndarray with the embeddings of all key phrases.
+        tag_index (TagIndex): the tag index, None when disabled
+
+    Returns:
+        list: a list of PascalCase tags per post
+    """
+    if tag_index is None:
+        return [[to_pascal_case(keyphrase[0]) for keyphrase in keyphrases] for keyphrases in batch_keyphrases]
+    phrases = [keyphrase[0] for keyphrases in batch_keyphrases for keyphrase in keyphrases]
+    vectors = embed(phrases) if callable(embed) and phrases else embed
+    batch_tags = []
+    start = 0
+    for keyphrases in batch_keyphrases:
+        batch_tags.append(tag_index.snap(keyphrases, vectors[start:start + len(keyphrases)]))
+        start += len(keyphrases)
+    return batch_tags
+
+
+def extract_tags(plain_text_md, models, settings, tag_index=None, verbose=True):
+    """ extracts the key phrases from a plain text document and returns them as tags
+
+    Args:
+        plain_text_md (str): the cleaned up plain text of the post
+        models (tuple): (vectorizer, kw_model) as returned by load_models
+        settings (dict): the NLP settings
+        tag_index (TagIndex, optional): snap the key phrases to the existing tags. Defaults to None.
+        verbose (bool, optional): print intermediate results. Defaults to True.
+
+    Returns:
+        list: PascalCase tags
+    """
+    vectorizer, kw_model = models
+    keyphrases = extract_keyphrases([plain_text_md], vectorizer, kw_model, settings['key_phrase_output_count'], settings.get('chunking'))
+    if verbose:
+        # After learning the keyphrases, they can be returned.
+        print("\r\nVectorized Key Phrases:",vectorizer.get_feature_names_out())
+        print("\r\nKeyBERT Key Phrases:",keyphrases[0])
+
+    # Transform key phrases to PascalCase
+    transformed_keyphrases = keyphrases_to_tags(keyphrases, kw_model.model.embed, tag_index)[0]
+    if verbose:
+        print("\r\nPascalCase Key Phrases:",transformed_keyphrases)
+    return transformed_keyphrases
+
+
+def tag_to_phrase(tag):
+    """ transforms a PascalCase tag back to a key phrase, to embed existing tags
+
+    Args:
+        tag (str): PascalCase tag, ie. 'GithubPages'
+
+    Returns:
+        str: key phrase, ie. 'github pages'
+    """
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', ' ', str(tag)).lower()
+
+
+def open_tag_index(settings):
+    """ opens the tag index when it is enabled in the settings
+
+    Args:
+        settings (dict): the NLP settings
+
+    Returns:
+        TagIndex: the tag index, None when disabled
+    """
+    index_settings = settings.get('tag_index', {})
+    if not index_settings.get('enabled', False):
+        return None
+    return TagIndex(
+        index_settings.get('path', 'tag_index.npz'),
+        embedding_model_name(settings),
+        float(index_settings.get('similarity_threshold', 0.85)))
+
+
+def sync_tag_index(tag_index, site_tags, embed):
+    """ adds the tags used across the site that are not in the tag index yet
+
+    Args:
+        tag_index (TagIndex): the tag index
+        site_tags (iterable): the tags of all posts
+        embed (function): embeds a list of key phrases, ie. kw_model.model.embed
+    """
+    missing_tags = tag_index.missing(site_tags)
+    if missing_tags:
+        print(f'Adding {len(missing_tags)} existing tags to the tag index...')
+        tag_index.add(missing_tags, embed([tag_to_phrase(tag) for tag in missing_tags]))
+        tag_index.save()
+
+
+def load_post(post_path):
+    """ opens the post markdown file
+
+    Args:
+        post_path (str): path of the post
+
+    Returns:
+        frontmatter.Post: the post, with its metadata and content
+    """
+    import frontmatter
+    return frontmatter.load(post_path)
+
+
+def current_tags_of(post):
+    """ fetches the current tags of a post
+
+    Args:
+        post (frontmatter.Post): the post
+
+    Returns:
+        list: the current tags, an empty list when there are none
+    """
+    try:
+        current_tags = post["tags"]
+        if current_tags is not None and len(current_tags) > 0:
+            return list(current_tags)
+    except (KeyError, TypeError):
+        pass
+    return []
+
+
+def write_post_legacy(input_file_path, post, tags):
+    """ saves the new tags to the post and rewrites the whole post, reserializing the YAML frontmatter
+
+    Args:
+        input_file_path (str): path of the post
+        post (frontmatter.Post): the post
+        tags (list): the new tags
+    """
+    import frontmatter
+    # Save new tags to existing post object
+    post.metadata["tags"] = tags
+
+    # Write updated post to disk
+    with open(input_file_path, 'w',encoding='utf8') as text_file:
+        text_file.write(frontmatter.dumps(post))
+
+
+def format_tags_block(tags, newline):
+    """ formats the 'tags' key of the YAML frontmatter, in the same block style as python-frontmatter
+
+    Args:
+        tags (list): the new tags
+        newline (bytes): line ending of the post
+
+    Returns:
+        bytes: the 'tags' key with its list of tags
+    """
+    import yaml
+    if not tags:
+        return b'tags: []' + newline
+    tag_lines = yaml.safe_dump(list(tags), default_flow_style=False, allow_unicode=True).splitlines()
+    return b'tags:' + newline + b''.join(tag_line.encode('utf-8') + newline for tag_line in tag_lines)
+
+
+def patch_tags_header(header_lines, tags_block):
+    """ replaces the 'tags' key in the lines of the YAML frontmatter, or adds it at the end
+
+    Args:
+        header_lines (list): the frontmatter lines (bytes) between the delimiters
+        tags_block (bytes): the new 'tags' key
+
+    Returns:
+        list: the patched frontmatter lines
+    """
+    start = None
+    for position, header_line in enumerate(header_lines):
+        if TAGS_KEY_PATTERN.match(header_line):
+            start = position
+            break
+    if start is None:
+        return header_lines + [tags_block]
+    # The value of the key continues on indented lines or on list items at the same indentation
+    end = start + 1
+    while end < len(header_lines) and re.match(rb'[ \t-]|\r?\n', header_lines[end]):
+        end += 1
+    # Keep the blank lines that follow the value
+    while end > start + 1 and not header_lines[end - 1].strip():
+        end -= 1
+    return header_lines[:start] + [tags_block] + header_lines[end:]
+
+
+def write_post(input_file_path, post, tags):
+    """ saves the new tags to the post and writes them to disk. Only the 'tags' key in the YAML frontmatter is patched,
+    the other keys and the body are streamed through untouched. The update is committed by replacing the post with a
+    temporary file, so the post is never left truncated.
+
+    Args:
+        input_file_path (str): path of the post
+        post (frontmatter.Post): the post
+        tags (list): the new tags
+    """
+    # Save new tags to existing post object
+    post.metadata["tags"] = tags
+
+    post_dir = os.path.dirname(os.path.abspath(input_file_path))
+    with open(input_file_path, 'rb') as source_file:
+        first_line = source_file.readline()
+        newline = b'\r\n' if first_line.endswith(b'\r\n') else b'\n'
+        tags_block = format_tags_block(tags, newline)
+        with tempfile.NamedTemporaryFile('wb', dir=post_dir, prefix='.' + os.path.basename(input_file_path), delete=False) as temp_file:
+            try:
+                if first_line.rstrip() == b'---':
+                    header_lines = []
+                    closing_line = b''
+                    for header_line in source_file:
+                        if header_line.rstrip() in (b'---', b'...'):
+                            closing_line = header_line
+                            break
+                        header_lines.append(header_line)
+                    temp_file.write(first_line)
+                    temp_file.writelines(patch_tags_header(header_lines, tags_block))
+                    temp_file.write(closing_line or b'---' + newline)
+                else:
+                    # No frontmatter yet
+                    temp_file.write(b'---' + newline + tags_block + b'---' + newline)
+                    temp_file.write(first_line)
+                shutil.copyfileobj(source_file, temp_file)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            except BaseException:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise
+    shutil.copymode(input_file_path, temp_file.name)
+    os.replace(temp_file.name, input_file_path)
+
+
+def iter_post_paths(pattern):
+    """ yields the markdown posts in a directory (recursively) or matching a glob pattern
+
+    Args:
+        pattern (str): directory or glob pattern
+
+    Yields:
+        str: path of a markdown post
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '**', '*.md')
+    for post_path in sorted(glob.iglob(pattern, recursive=True)):
+        if os.path.isfile(post_path) and re.search(r'.md$', post_path) is not None:
+            yield post_path
+
+
+def content_hash(plain_text_md):
+    """ computes the hash of the cleaned up plain text of a post
+
+    Args:
+        plain_text_md (str): the cleaned up plain text of the post
+
+    Returns:
+        str: hex digest
+    """
+    return hashlib.sha256(plain_text_md.encode('utf-8')).hexdigest()
+
+
+def config_fingerprint(settings):
+    """ computes the fingerprint of the settings that influence the resulting tags
+
+    Args:
+        settings (dict): the NLP settings
+
+    Returns:
+        str: hex digest
+    """
+    fingerprint_settings = {key: settings.get(key) for key in FINGERPRINT_SETTINGS}
+    return hashlib.sha256(json.dumps(fingerprint_settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_tagging_state(settings):
+    """ loads the content hashes and config fingerprints of previously tagged posts
+
+    Args:
+        settings (dict): the NLP settings
+
+    Returns:
+        dict: absolute post path to {'content_hash', 'config_fingerprint', 'tags'}, None when disabled
+    """
+    state_settings = settings.get('tagging_state', {})
+    if not state_settings.get('enabled', False):
+        return None
+    try:
+        with open(state_settings.get('path', 'tagging_state.json'), 'r', encoding='utf8') as state_file:
+            return json.load(state_file)
+    except FileNotFoundError:
+        return {}
+    except ValueError as error:
+        print('Tagging state is unreadable, starting over:', error)
+        return {}
+
+
+def save_tagging_state(settings, state):
+    """ saves the tagging state, replacing the previous file in one go
+
+    Args:
+        settings (dict): the NLP settings
+        state (dict): the tagging state, nothing is saved when None
+    """
+    if state is None:
+        return
+    state_file_name = settings.get('tagging_state', {}).get('path', 'tagging_state.json')
+    with open(state_file_name + '.tmp', 'w', encoding='utf8') as state_file:
+        json.dump(state, state_file, indent=1, sort_keys=True)
+    os.replace(state_file_name + '.tmp', state_file_name)
+
+
+def is_unchanged(state, post_path, plain_text_hash, fingerprint):
+    """ checks whether a post was tagged before with the same content and settings
+
+    Args:
+        state (dict): the tagging state, None when disabled
+        post_path (str): path of the post
+        plain_text_hash (str): content hash of the cleaned up plain text
+        fingerprint (str): config fingerprint of the current settings
+
+    Returns:
+        bool: True when the post does not need to be tagged again
+    """
+    if state is None:
+        return False
+    entry = state.get(os.path.abspath(post_path))
+    return entry is not None and entry['content_hash'] == plain_text_hash and entry['config_fingerprint'] == fingerprint
+
+
+def record_tagging(state, post_path, plain_text_hash, fingerprint, tags):
+    """ records a tagged post in the tagging state
+
+    Args:
+        state (dict): the tagging state, nothing is recorded when None
+        post_path (str): path of the post
+        plain_text_hash (str): content hash of the cleaned up plain text
+        fingerprint (str): config fingerprint of the current settings
+        tags (list): the new tags
+    """
+    if state is not None:
+        state[os.path.abspath(post_path)] = {'content_hash': plain_text_hash, 'config_fingerprint': fingerprint, 'tags': tags}
+
+
+def tag_single_post(input_file_path, settings, options):
+    """ adds tags to a single post, asking before overwriting existing tags
+
+    Args:
+        input_file_path (str): path of the post
+        settings (dict): the NLP settings
+        options (dict): CLI options ('force')
+    """
+    # Open the Post Markdown file
+    with profile_stage('read', input_file_path):
+        post = load_post(input_file_path)
+    state = load_tagging_state(settings)
+    fingerprint = config_fingerprint(settings)
+
+    # Fetch current tags
+    overwrite = 'N'
+    current_tags = current_tags_of(post)
+    if len(current_tags) > 0:
+        # Clean up the MarkDown Jekyll document
+        plain_text_md = clean_post_text(post.content, settings['text_cleaner'], input_file_path)
+        if not options['force'] and is_unchanged(state, input_file_path, content_hash(plain_text_md), fingerprint):
+            print('Tags '+str(current_tags)+' are up to date, the post did not change since it was tagged. Use -f to tag it again.')
+            return
+        overwrite = input('\r\nWARNING: Tags '+str(current_tags)+' are already present. Do you wish to overwrite? (Y/N)')
+    else:
+        print("'tags' metdata does not exist. Continuing...")
+        overwrite = 'Y'
+
+    if re.match('[y]', overwrite, re.IGNORECASE):
+        # Clean up the MarkDown Jekyll document
+        with profile_stage('clean', input_file_path):
+            plain_text_md = clean_post_text(post.content, settings['text_cleaner'], input_file_path)
+        print("\r\nPlain Text MD Document:",plain_text_md)
+
+        models = load_models(settings)
+        tag_index = open_tag_index(settings)
+        with profile_stage('extract', input_file_path):
+            tags = extract_tags(plain_text_md, models, settings, tag_index)
+        close_models(models[1])
+        if tag_index is not None:
+            tag_index.save()
+        with profile_stage('write', input_file_path):
+            write_post(input_file_path, post, tags)
+        record_tagging(state, input_file_path, content_hash(plain_text_md), fingerprint, tags)
+        save_tagging_state(settings, state)
+
+
+def write_batch(batch, batch_tags, settings, summary, state):
+    """ writes the extracted tags of a batch of posts to disk
+
+    Args:
+        batch (list): (path, post, plain text, content hash) tuples
+        batch_tags (list): a list of PascalCase tags per post
+        settings (dict): the NLP settings
+        summary (list): summary tuples (path, status, tags), the results are appended
+        state (dict): the tagging state, None when disabled
+    """
+    fingerprint = config_fingerprint(settings)
+    for (post_path, post, _, plain_text_hash), tags in zip(batch, batch_tags):
+        try:
+            with profile_stage('write', post_path):
+                write_post(post_path, post, tags)
+            record_tagging(state, post_path, plain_text_hash, fingerprint, tags)
+            summary.append((post_path, 'tagged', tags))
+        except Exception as error:
+            summary.append((post_path, 'error: ' + str(error), []))
+        print('Processed:', post_path)
+    # Save after every batch, so an interrupted run does not lose the progress
+    save_tagging_state(settings, state)
+
+
+def init_worker(settings, workers):
+    """ initializes a worker process of the pool, loading the models once per worker
+
+    Args:
+        settings (dict): the NLP settings
+        workers (int): number of worker processes, used to divide the CPU threads
+    """
+    global WORKER_SETTINGS, WORKER_MODELS
+    try:
+        # Prevent the workers from competing for the same cores
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+    WORKER_SETTINGS = settings
+    WORKER_MODELS = load_models(settings, verbose=False)
+
+
+def extract_in_worker(docs):
+    """ extracts the key phrases of a batch of documents in a worker process
+
+    Args:
+        docs (list): the cleaned up plain text of the posts
+
+    Returns:
+        dict: 'keyphrases' (a list of (key phrase, score) tuples per document), 'vectors' (the embeddings of all key phrases
+        when the tag index is enabled, the tag index itself is kept by the main process) and the embedding cache 'hits' and 'misses'
+    """
+    vectorizer, kw_model = WORKER_MODELS
+    cache = kw_model.model.cache if isinstance(kw_model.model, CachedEmbedder) else None
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    keyphrases = extract_keyphrases(docs, vectorizer, kw_model, WORKER_SETTINGS['key_phrase_output_count'], WORKER_SETTINGS.get('chunking'))
+    keyphrases = [[(str(keyphrase), float(score)) for keyphrase, score in doc_keyphrases] for doc_keyphrases in keyphrases]
+    vectors = None
+    phrases = [keyphrase for doc_keyphrases in keyphrases for keyphrase, _ in doc_keyphrases]
+    if WORKER_SETTINGS.get('tag_index', {}).get('enabled', False) and phrases:
+        vectors = kw_model.model.embed(phrases)
+    result = {'keyphrases': keyphrases, 'vectors': vectors, 'hits': 0, 'misses': 0}
+    if cache is not None:
+        result['hits'], result['misses'] = cache.hits - hits, cache.misses - misses
+    return result
+
+
+def embed_in_worker(phrases):
+    """ embeds key phrases in a worker process
+
+    Args:
+        phrases (list): key phrases
+
+    Returns:
+        numpy.ndarray: one embedding per key phrase
+    """
+    return WORKER_MODELS[1].model.embed(phrases)
+
+
+def collect_site_tags(pattern):
+    """ collects the tags of all posts in a directory or matching a glob pattern
+
+    Args:
+        pattern (str): directory or glob pattern
+
+    Returns:
+        set: the tags
+    """
+    site_tags = set()
+    for post_path in iter_post_paths(pattern):
+        try:
+            site_tags.update(str(tag) for tag in current_tags_of(load_post(post_path)))
+        except Exception as error:
+            print('Unable to read the tags of', post_path, error)
+    return site_tags
+
+
+def tag_posts(pattern, settings, options):
+    """ adds tags to all posts in a directory or matching a glob pattern. The models are loaded only once
+    (per worker) and the posts are sent to KeyBERT in batches of 'batch_size' (see 'nlp.json').
+    Posts whose plain text and settings did not change since they were last tagged are skipped.
+
+    Args:
+        pattern (str): directory or glob pattern
+        settings (dict): the NLP settings
+        options (dict): CLI options ('overwrite' existing tags, 'force' tagging of unchanged posts, number of 'workers')
+
+    Returns:
+        list: summary tuples (path, status, tags)
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+    models = []
+    pool = []
+    pending = {}
+    state = load_tagging_state(settings)
+    fingerprint = config_fingerprint(settings)
+    summary = []
+    batch = []
+    throughput = {'count': 0, 'start': None, 'hits': 0, 'misses': 0}
+    tag_index = open_tag_index(settings)
+    # The tags of all posts are added to the tag index once the models are loaded
+    site_tags = collect_site_tags(pattern) if tag_index is not None else set()
+
+    def report_throughput(batch_size):
+        throughput['count'] += batch_size
+        print(f"Throughput: {throughput['count'] / (time.perf_counter() - throughput['start']):.2f} docs/sec")
+
+    def collect_results(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            done_batch = pending.pop(future)
+            try:
+                result = future.result()
+                throughput['hits'] += result['hits']
+                throughput['misses'] += result['misses']
+                batch_tags = keyphrases_to_tags(result['keyphrases'], result['vectors'], tag_index)
+            except Exception as error:
+                for item in done_batch:
+                    summary.append((item[0], 'error: ' + str(error), []))
+            else:
+                write_batch(done_batch, batch_tags, settings, summary, state)
+            report_throughput(len(done_batch))
+
+    def flush_batch():
+        if throughput['start'] is None:
+            throughput['start'] = time.perf_counter()
+        if options['workers'] > 1:
+            # Fan the batch out to the worker pool, the frontmatter is written by this (parent) process
+            if not pool:
+                pool.append(ProcessPoolExecutor(
+                    max_workers=options['workers'], initializer=init_worker, initargs=(settings, options['workers'])))
+                if tag_index is not None:
+                    sync_tag_index(tag_index, site_tags, lambda phrases: pool[0].submit(embed_in_worker, phrases).result())
+            pending[pool[0].submit(extract_in_worker, [item[2] for item in batch])] = list(batch)
+            # Bound the number of posts held in memory
+            if len(pending) >= 2 * options['workers']:
+                collect_results(FIRST_COMPLETED)
+        else:
+            # Only load the models when there is something to tag
+            if not models:
+                models.extend(load_models(settings))
+                if tag_index is not None:
+                    sync_tag_index(tag_index, site_tags, models[1].model.embed)
+            try:
+                batch_description = f"batch of {len(batch)} posts starting at {batch[0][0]}"
+                with profile_stage('extract', batch_description, len(batch)):
+                    batch_keyphrases = extract_keyphrases(
+                        [item[2] for item in batch], models[0], models[1], settings['key_phrase_output_count'], settings.get('chunking'))
+                with profile_stage('snap' if tag_index is not None else 'pascal_case', batch_description, len(batch)):
+                    batch_tags = keyphrases_to_tags(batch_keyphrases, models[1].model.embed, tag_index)
+            except Exception as error:
+                for item in batch:
+                    summary.append((item[0], 'error: ' + str(error), []))
+            else:
+                write_batch(batch, batch_tags, settings, summary, state)
+            report_throughput(len(batch))
+        batch.clear()
+
+    for post_path in iter_post_paths(pattern):
+        try:
+            with profile_stage('read', post_path):
+                post = load_post(post_path)
+            current_tags = current_tags_of(post)
+            if len(current_tags) > 0 and not options['overwrite']:
+                summary.append((post_path, 'skipped (tags present)', current_tags))
+                continue
+            with profile_stage('clean', post_path):
+                plain_text_md = clean_post_text(post.content, settings['text_cleaner'], post_path)
+                plain_text_hash = content_hash(plain_text_md)
+            if len(current_tags) > 0 and not options['force'] and is_unchanged(state, post_path, plain_text_hash, fingerprint):
+                summary.append((post_path, 'skipped (unchanged)', current_tags))
+                continue
+            batch.append((post_path, post, plain_text_md, plain_text_hash))
+        except Exception as error:
+            summary.append((post_path, 'error: ' + str(error), []))
+        if len(batch) >= settings['batch_size']:
+            flush_batch()
+    if batch:
+        flush_batch()
+    if pool:
+        collect_results(ALL_COMPLETED)
+        pool[0].shutdown()
+        # The workers share the cache, evict once they are done
+        cache = open_embedding_cache(settings)
+        if cache is not None:
+            cache.hits, cache.misses = throughput['hits'], throughput['misses']
+            print('\r\nEmbedding cache:', cache.stats())
+            cache.close()
+    if models:
+        close_models(models[1])
+    if tag_index is not None and throughput['count'] > 0:
+        tag_index.save()
+        print(f'\r\nTag index: {len(tag_index)} tags')
+    if throughput['count'] > 0:
+        extraction_time = time.perf_counter() - throughput['start']
+        print(f"\r\nExtracted {throughput['count']} posts in {extraction_time:.2f} seconds ({throughput['count'] / extraction_time:.2f} docs/sec)")
+    return summary
+
+
+def tag_post(post_path, models, settings, options):
+    """ adds tags to a single post without asking, used by the tagging server
+
+    Args:
+        post_path (str): path of the post
+        models (tuple): (vectorizer, kw_model) as returned by load_models
+        settings (dict): the NLP settings
+        options (dict): request options ('overwrite' existing tags, 'force' tagging of an unchanged post)
+
+    Returns:
+        dict: 'status' ('tagged', 'unchanged' or 'tags_present') and 'tags'
+    """
+    post = load_post(post_path)
+    current_tags = current_tags_of(post)
+    plain_text_md = clean_post_text(post.content, settings['text_cleaner'], post_path)
+    plain_text_hash = content_hash(plain_text_md)
+    # The state is read on every request, as batch runs may have updated it in the meantime
+    state = load_tagging_state(settings)
+    fingerprint = config_fingerprint(settings)
+    if len(current_tags) > 0:
+        if not options['force'] and is_unchanged(state, post_path, plain_text_hash, fingerprint):
+            return {'status': 'unchanged', 'tags': current_tags}
+        if not options['overwrite']:
+            return {'status': 'tags_present', 'tags': current_tags}
+    tag_index = open_tag_index(settings)
+    tags = extract_tags(plain_text_md, models, settings, tag_index, verbose=False)
+    if tag_index is not None:
+        tag_index.save()
+    write_post(post_path, post, tags)
+    record_tagging(state, post_path, plain_text_hash, fingerprint, tags)
+    save_tagging_state(settings, state)
+    return {'status': 'tagged', 'tags': tags}
+
+
+def is_within(path, root):
+    """ checks whether a path is (after resolving symlinks and '..') within a root directory
+
+    Args:
+        path (str): the path
+        root (str): the resolved root directory
+
+    Returns:
+        bool: True when the path is within the root
+    """
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+def serve(settings):
+    """ runs the tagging server, which keeps the models warm between requests of the client ('add_keyphrases_client.py')
+
+    Args:
+        settings (dict): the NLP settings
+    """
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    server_settings = settings.get('server', {})
+
+    class TaggingRequestHandler(BaseHTTPRequestHandler):
+        """ handles the requests of the tagging server (see '--serve'). The models are kept warm on the server object.
+        """
+        def do_GET(self):
+            """ answers the health check of the client on '/health'
+            """
+            if self.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            else:
+                self.send_json(404, {'status': 'error', 'error': 'Not found'})
+
+        def do_POST(self):
+            """ tags a post on '/tag', the request body is {"path": "...", "overwrite": false, "force": false}
+
+            Only JSON requests are accepted: a web page can not send those to localhost without a CORS preflight, which this server does not answer.
+            The Host header has to be the server address (against DNS rebinding) and the post has to be within the 'site_root' (see 'server' in 'nlp.json').
+            """
+            if self.path != '/tag':
+                self.send_json(404, {'status': 'error', 'error': 'Not found'})
+                return
+            if self.headers.get_content_type() != 'application/json':
+                self.send_json(415, {'status': 'error', 'error': 'Content-Type must be application/json'})
+                return
+            if self.headers.get('Host', '').lower() not in self.server.allowed_hosts:
+                self.send_json(403, {'status': 'error', 'error': 'Unexpected Host header'})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError:
+                self.send_json(400, {'status': 'error', 'error': 'Request body is not valid JSON'})
+                return
+            if not isinstance(request, dict) or not isinstance(request.get('path'), str):
+                self.send_json(400, {'status': 'error', 'error': "Request body must be a JSON object with the 'path' of the post"})
+                return
+            post_path = request['path']
+            try:
+                if re.search(r'.md$', post_path) is None:
+                    self.send_json(400, {'status': 'error', 'error': 'Input file is not a markdown file (with .md extension)'})
+                    return
+                if not is_within(post_path, self.server.site_root):
+                    self.send_json(403, {'status': 'error', 'error': f'Post is not within the site root {self.server.site_root}'})
+                    return
+                options = {'overwrite': bool(request.get('overwrite', False)), 'force': bool(request.get('force', False))}
+                self.send_json(200, tag_post(post_path, self.server.models, self.server.settings, options))
+            except Exception as error:
+                self.send_json(500, {'status': 'error', 'error': str(error)})
+
+        def send_json(self, code, response):
+            """ sends a JSON response
+
+            Args:
+                code (int): HTTP status code
+                response (dict): the response body
+            """
+            body = json.dumps(response).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """ logs the requests without the client address
+            """
+            print(time.strftime('%H:%M:%S'), format % args)
+
+    # Only listen on the loopback interface, the server writes to local files
+    server = HTTPServer((server_settings.get('host', '127.0.0.1'), int(server_settings.get('port', 8765))), TaggingRequestHandler)
+    host, port = server.server_address[:2]
+    server.allowed_hosts = {f'{name}:{port}' for name in (host, 'localhost', '127.0.0.1')}
+    # Relative to the working directory of the server, the example 'tasks.json' runs it in '.vscode/scripts' of the site
+    server.site_root = os.path.realpath(server_settings.get('site_root', '../..'))
+    server.settings = settings
+    server.models = load_models(settings)
+    print(f'Tagging server listening on http://{host}:{port} for posts in {server.site_root} (press CTRL+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_models(server.models[1])
+
+
+def print_summary(summary):
+    """ prints the per file summary of a batch run
+
+    Args:
+        summary (list): summary tuples (path, status, tags)
+    """
+    print('\r\nSummary:')
+    for post_path, status, tags in summary:
+        print(f'{post_path}: {status} {tags}')
+    tagged = sum(1 for item in summary if item[1] == 'tagged')
+    errors = sum(1 for item in summary if item[1].startswith('error'))
+    print(f'\r\n{len(summary)} posts, {tagged} tagged, {len(summary) - tagged - errors} skipped, {errors} errors')
 
 
 def main(argv):
-    """_summary_
+    """ processes the CLI input and tags either a single post or all posts in a directory
 
     Args:
-        argv (_type_): _description_
+        argv (list): CLI arguments
     """
     # Init Variables
     input_file_path: str | None = None
-    help_message: str = 'add_keyphrases_to_jekyll_blog_post.py -i <input_absolute_file_path>'
-    numberof_phrases: int | None = None
-    keyphrase_count_vectorizer_args: dict | None = None
-    keybert_args: dict | None = None
+    input_pattern: str | None = None
+    options: dict = {'overwrite': False, 'force': False, 'workers': 1}
+    serve_mode: bool = False
+    profile_report_path: str | None = None
+    cprofile_path: str | None = None
+    help_message: str = 'add_keyphrases_to_jekyll_blog_post.py -i <input_absolute_file_path> [-f]' + \
+        ' OR add_keyphrases_to_jekyll_blog_post.py -d <posts_directory_or_glob> [-y] [-f] [-w <workers>] OR add_keyphrases_to_jekyll_blog_post.py -s' + \
+        '\r\nProfiling: [-p <report.json|report.csv>] [--cprofile <file.prof>]'
 
     # Processing CLI input
     try:
-        opts, args = getopt.getopt(argv,"hi:",["help","in="])
+        opts, args = getopt.getopt(argv,"hi:d:yfw:sp:",["help","in=","dir=","yes","force","workers=","serve","profile=","cprofile="])
     except getopt.GetoptError:
         print(help_message)
         sys.exit(2)
@@ -114,7 +1731,7 @@ def main(argv):
         print(help_message)
         sys.exit(2)
     for opt, arg in opts:
-        if opt == '-h':
+        if opt in ("-h", "--help"):
             print(help_message)
             sys.exit()
         elif opt in ("-i", "--in"):
@@ -126,96 +1743,65 @@ def main(argv):
             if re.search(r'.md$',input_file_path) is None:
                 print('Input file is not a markdown file (with .md extension). Exiting...')
                 sys.exit(2)
-    print ('Input file path is:', input_file_path, '\r\n')
+        elif opt in ("-d", "--dir"):
+            input_pattern = str(arg)
+        elif opt in ("-y", "--yes"):
+            options['overwrite'] = True
+        elif opt in ("-f", "--force"):
+            options['force'] = True
+        elif opt in ("-w", "--workers"):
+            try:
+                options['workers'] = max(1, int(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-s", "--serve"):
+            serve_mode = True
+        elif opt in ("-p", "--profile"):
+            profile_report_path = str(arg)
+        elif opt == "--cprofile":
+            cprofile_path = str(arg)
+    if input_file_path is None and input_pattern is None and not serve_mode:
+        print(help_message)
+        sys.exit(2)
 
     # Load JSON settings
-    with open('nlp.json', 'r',encoding='utf8') as json_data_file:
-        json_object = json.load(json_data_file)
-
-    # Set NLP Variables
     try:
-        numberof_phrases = int(json_object['settings']['key_phrase_output_count'])
-        keyphrase_count_vectorizer_args = json_object['settings']['nlp_models'][0]['arguments']
-        print(keyphrase_count_vectorizer_args)
-        keybert_args = json_object['settings']['nlp_models'][1]['arguments']
-        print(keybert_args)
+        settings = load_settings()
     except Exception as error:
         print(error)
         sys.exit(2)
 
-    # Open the Post Markdown file
-    post = frontmatter.load(input_file_path)
-    #print(post.content)
-    #print(post.metadata)
-    #sorted(post.keys())
+    # Profiling
+    global PROFILER
+    if profile_report_path is not None:
+        PROFILER = StageProfiler()
+        if options['workers'] > 1:
+            print('Profiling runs in-process, ignoring the number of workers.')
+            options['workers'] = 1
+    cprofile = None
+    if cprofile_path is not None:
+        import cProfile
+        cprofile = cProfile.Profile()
+        cprofile.enable()
 
-    # Fetch current tags
-    overwrite = 'N'
     try:
-        current_tags = post["tags"]
-        if len(current_tags) > 0:
-            overwrite = input('\r\nWARNING: Tags '+str(current_tags)+' are already present. Do you wish to overwrite? (Y/N)')
-    except (KeyError, TypeError):
-        print("'tags' metdata does not exist. Continuing...")
-        overwrite = 'Y'
-
-    if re.match('[y]', overwrite, re.IGNORECASE):
-        # Clean up the MarkDown Jekyll document
-        plain_text_md = md_to_text(post.content)
-        plain_text_md = re.sub(r"{{.*}}", '', plain_text_md)
-        plain_text_md = re.sub(r"{%.*%}", '', plain_text_md)
-        plain_text_md = re.sub(r"(\[\^\d+\](:\s)?)", '', plain_text_md)
-        plain_text_md = re.sub(r"\[(.*)\]:\s", r"\1: ", plain_text_md)
-        plain_text_md = re.sub(r"```.*```", '', plain_text_md, flags=re.S)
-        print("\r\nPlain Text MD Document:",plain_text_md)
-
-        # Load the document as list
-        docs = []
-        docs.append(plain_text_md)
-
-        # Init default vectorizer
-        try:
-            #keyphrase_count_vectorizer_args[0] = nlp
-            vectorizer = KeyphraseCountVectorizer(**keyphrase_count_vectorizer_args)
-        except Exception as error:
-            print("KeyphraseCountVectorizer error:", error)
-            sys.exit(2)
-
-        # Fit the vectorizer with key phrases from the document
-        vectorizer.fit(docs)
-
-        # After learning the keyphrases, they can be returned.
-        vectorized_keyphrases = vectorizer.get_feature_names_out()
-        print("\r\nVectorized Key Phrases:",vectorized_keyphrases)
-
-        # Init KeyBERT
-        try:
-            kw_model = KeyBERT(**keybert_args)
-        except Exception as error:
-            print("KeyBERT error:", error)
-            sys.exit(2)
-
-        # Use keyphrase vectorizer to decide on suitable keyphrases
-        # adding ', use_mmr=True, diversity=0.3' to the settings and varying the diversity may prove useful at some point.
-        keyphrases = kw_model.extract_keywords(docs=docs, top_n=numberof_phrases, vectorizer=vectorizer)
-        print("\r\nKeyBERT Key Phrases:",keyphrases)
-
-        # Transform key phrases to PascalCase
-        transformed_keyphrases = []
-        for keyphrase in keyphrases:
-            keyphrase_pascal_case = ''.join(x for x in keyphrase[0].title() if not x.isspace())
-            transformed_keyphrases.append(keyphrase_pascal_case)
-        print("\r\nPascalCase Key Phrases:",transformed_keyphrases)
-
-        # Save new tags to existing post object
-        post.metadata["tags"] = transformed_keyphrases
-
-        # Write updated post to disk
-        file_io = BytesIO()
-        frontmatter.dump(post, file_io)
+        if serve_mode:
+            serve(settings)
+        elif input_file_path is not None:
+            print ('Input file path is:', input_file_path, '\r\n')
+            tag_single_post(input_file_path, settings, options)
+        else:
+            print ('Input directory or pattern is:', input_pattern, '\r\n')
+            print_summary(tag_posts(input_pattern, settings, options))
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
+            cprofile.dump_stats(cprofile_path)
+            print('\r\ncProfile dump written to:', cprofile_path)
+        if PROFILER is not None:
+            PROFILER.write_report(profile_report_path, settings)
 
-        with open(input_file_path, 'w',encoding='utf8') as text_file:
-            update_file = text_file.write(file_io.getvalue().decode('utf-8'))
 
 # Start main thread
 if __name__ == "__main__":
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+
+"""
+License:
+This file is part of the 'PublicPythonProjects' distribution (https://github.com/sjoerdv or http://sjoerdv.github.io).
+Copyright (C) 2022  Sjoerd de Valk
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License version 3 as published by
+the Free Software Foundation.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Description:
+This program benchmarks parts of 'add_keyphrases_to_jekyll_blog_post.py' on a folder of Jekyll posts, or on a generated (reproducible) corpus of Jekyll posts.
+The results are printed as JSON and can be saved as a baseline to compare later runs with (ie. after changing the models in 'nlp.json').
+
+Benchmarks:
+* cleaner: compares the streaming markdown cleaner with the legacy markdown/Beautiful Soup cleaner.
+  It reports the time per post and the parity of both outputs (Jaccard similarity of the words, leaving out fenced code which only the streaming cleaner strips).
+* backends: compares the PyTorch embedding backend with the ONNX Runtime int8 backend ("embedding_backend" in 'nlp.json').
+  It reports the extraction latency per post and the agreement of the top-N key phrases (the share of the PyTorch key phrases also found by ONNX).
+* writer: compares the minimal-rewrite frontmatter writer with the legacy writer (that reserializes the whole post) on copies of the posts,
+  padded to 'size' megabytes to simulate large posts. It also checks the round-trip: only the tags may change, the other frontmatter keys (and their order) and the body must be identical.
+* pipeline: measures the tagger end to end with the settings of 'nlp.json' (without embedding cache and tag index):
+  cold start (a fresh Python process that imports the tagger, loads the models and tags one post), warm latency per post (mean, median and p95),
+  posts per second in batch mode ('batch_size' posts per batch) and the peak memory (RSS) of both processes.
+
+Corpus:
+'-g <posts>' generates a corpus of Jekyll posts in a temporary directory instead of using '-d'. The posts vary in length (a few sentences up to a few thousand words)
+and contain headings, links, emphasis, Liquid tags, fenced code blocks and footnotes. The same seed ('-r') always generates the same corpus.
+
+Offline:
+The benchmark sets HF_HUB_OFFLINE and TRANSFORMERS_OFFLINE (also for the cold start process), so the locally cached models are used and nothing is downloaded.
+Use '--online' to allow downloads, ie. the first time a model is used.
+
+Prerequisites:
+* Python3 3.9+
+* The prerequisites of 'add_keyphrases_to_jekyll_blog_post.py' (including markdown and beautifulsoup4 for 'cleaner' and sentence-transformers[onnx] for 'backends')
+* 'resource' (Linux and macOS) for the peak memory of 'pipeline'
+
+References:
+* time.perf_counter: https://docs.python.org/3/library/time.html#time.perf_counter
+* resource.getrusage: https://docs.python.org/3/library/resource.html#resource.getrusage
+* Hugging Face offline mode: https://huggingface.co/docs/transformers/installation#offline-mode
+
+Image Sources:
+None
+
+Tested on:
+* Linux
+** OS: LMDE 5 (elsie) x86_64
+** Kernel: 6.0.0-0.deb11.2-amd64
+** WM: Cinnamon 5.4.12
+** Python3: 3.9.2
+
+Example:
+benchmark_add_keyphrases.py -b cleaner -d "/home/user/full_path_to_jekyll_site/_posts" -n 5
+This will clean every post in the directory 5 times with both cleaners and print the results.
+benchmark_add_keyphrases.py -b backends -d "/home/user/full_path_to_jekyll_site/_posts" -n 3
+This will extract the key phrases of every post 3 times with both embedding backends (one post at a time, without embedding cache) and print the results.
+benchmark_add_keyphrases.py -b writer -d "/home/user/full_path_to_jekyll_site/_posts" -n 5 -s 10
+This will write tags to copies of every post (with its body padded to 10 MB) 5 times with both writers and print the results.
+benchmark_add_keyphrases.py -b pipeline -g 200 -n 3 -o baseline.json
+This will generate 200 posts, measure the cold start, the warm latency (3 times per post) and the batch throughput and save the results as a baseline.
+benchmark_add_keyphrases.py -b pipeline -g 200 -n 3 -c baseline.json
+This will run the same benchmark and compare the results with the baseline (the change of every number, in percent).
+"""
+
+
+# Import modules
+from __future__ import annotations
+import sys
+import getopt
+import re
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import statistics
+import subprocess
+import add_keyphrases_to_jekyll_blog_post as tagger
+
+
+# Define constants
+BENCHMARKS = ('cleaner', 'backends', 'writer', 'pipeline')
+OFFLINE_ENVIRONMENT = {'HF_HUB_OFFLINE': '1', 'TRANSFORMERS_OFFLINE': '1'}
+CORPUS_WORDS = (
+    'jekyll', 'python', 'blog', 'post', 'static', 'site', 'generator', 'markdown', 'frontmatter', 'liquid', 'template', 'github', 'pages',
+    'keyphrase', 'extraction', 'embedding', 'model', 'sentence', 'transformer', 'language', 'processing', 'script', 'automation', 'linux',
+    'terminal', 'command', 'configuration', 'deployment', 'repository', 'workflow', 'theme', 'layout', 'category', 'tag', 'archive',
+    'mastodon', 'discussion', 'comment', 'graphql', 'api', 'request', 'token', 'cache', 'database', 'performance', 'benchmark', 'memory',
+    'the', 'a', 'of', 'and', 'to', 'in', 'is', 'for', 'with', 'on', 'this', 'that', 'by', 'from', 'it', 'uses', 'runs', 'writes', 'reads')
+# The cold start process, run from the current directory (that contains 'nlp.json')
+COLD_START_CODE = '''
+import sys, json, time
+start_time = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import add_keyphrases_to_jekyll_blog_post as tagger
+import_seconds = time.perf_counter() - start_time
+settings = tagger.load_settings()
+settings['embedding_cache'] = {'enabled': False}
+models = tagger.load_models(settings, verbose=False)
+load_seconds = time.perf_counter() - start_time - import_seconds
+with open(sys.argv[2], 'r', encoding='utf8') as post_file:
+    text = tagger.clean_post_text(post_file.read(), settings['text_cleaner'])
+tagger.extract_tags(text, models, settings, verbose=False)
+print(json.dumps({'import_seconds': import_seconds, 'load_seconds': load_seconds,
+                  'first_post_seconds': time.perf_counter() - start_time - import_seconds - load_seconds, 'peak_rss_mb': tagger.peak_rss_mb()}))
+'''
+FENCED_CODE_PATTERN = re.compile(r'^\s*(`{3,}|~{3,}).*?^\s*\1\s*$', flags=re.M | re.S)
+
+
+# Define functions
+def word_set(plain_text):
+    """ returns the lowercase words of a plain text
+
+    Args:
+        plain_text (str): plain text
+
+    Returns:
+        set: words
+    """
+    return set(re.findall(r'\w+', plain_text.lower()))
+
+
+def corpus_sentence(rng):
+    """ returns a random sentence of corpus words, with some markdown inline markup
+
+    Args:
+        rng (random.Random): the random generator
+
+    Returns:
+        str: the sentence
+    """
+    words = [rng.choice(CORPUS_WORDS) for _ in range(rng.randint(6, 20))]
+    markup = rng.random()
+    if markup < 0.1:
+        words[1] = f'[{words[1]}](https://example.com/{words[1]})'
+    elif markup < 0.2:
+        words[2] = f'**{words[2]}**'
+    elif markup < 0.3:
+        words[0] = f'`{words[0]}`'
+    return ' '.join(words).capitalize() + '.'
+
+
+def generate_post(rng, number):
+    """ generates a Jekyll post of varying length with headings, Liquid tags (also one-line raw blocks), fenced code and footnotes
+
+    Args:
+        rng (random.Random): the random generator
+        number (int): the number of the post, part of its title
+
+    Returns:
+        str: the post, including the frontmatter
+    """
+    title = ' '.join(rng.choice(CORPUS_WORDS[:48]) for _ in range(3)).title()
+    lines = ['---', 'layout: post', f'title: "{title} {number}"', f'date: 2023-01-01 12:00:{number % 60:02d} +0100',
+             'categories: [benchmark]', 'tags: []', '---', '']
+    # Lengths from a few sentences to a few thousand words, most posts are short
+    footnotes = 0
+    for paragraph in range(max(1, int(rng.expovariate(1 / 12)))):
+        if paragraph % 5 == 0:
+            lines += [f'## {corpus_sentence(rng)[:-1]}', '']
+        sentences = [corpus_sentence(rng) for _ in range(rng.randint(2, 8))]
+        if rng.random() < 0.2:
+            footnotes += 1
+            sentences[-1] += f'[^{footnotes}]'
+        lines += [' '.join(sentences), '']
+        feature = rng.random()
+        if feature < 0.15:
+            lines += ['```python', 'def main(argv):', '    print("Hello, World!")', '    return 0', '```', '']
+        elif feature < 0.25:
+            lines += ['{% highlight bash %}', 'bundle exec jekyll serve', '{% endhighlight %}', '']
+        elif feature < 0.35:
+            lines += [f'![Image]({{{{ site.baseurl }}}}/assets/images/{number}-{paragraph}.png)', '']
+        elif feature < 0.45:
+            lines += ['{% raw %}`{{ page.title }}`{% endraw %} ' + corpus_sentence(rng), '']
+    lines += [f'[^{footnote}]: {corpus_sentence(rng)}' for footnote in range(1, footnotes + 1)]
+    return '\n'.join(lines) + '\n'
+
+
+def generate_corpus(directory, posts, seed):
+    """ generates a reproducible corpus of Jekyll posts
+
+    Args:
+        directory (str): the directory to write the posts to
+        posts (int): number of posts
+        seed (int): seed of the random generator, the same seed generates the same corpus
+
+    Returns:
+        list: paths of the posts
+    """
+    rng = random.Random(seed)
+    post_paths = []
+    for number in range(1, posts + 1):
+        post_path = os.path.join(directory, f'2023-01-01-benchmark-post-{number}.md')
+        with open(post_path, 'w', encoding='utf8') as post_file:
+            post_file.write(generate_post(rng, number))
+        post_paths.append(post_path)
+    return post_paths
+
+
+def time_cleaner(cleaner, contents, repeats):
+    """ times a cleaner over all posts
+
+    Args:
+        cleaner (function): the cleaner, taking the markdown content
+        contents (list): the markdown content of the posts
+        repeats (int): number of times every post is cleaned
+
+    Returns:
+        tuple: (seconds per post, outputs of the last repeat)
+    """
+    outputs = []
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        outputs = [cleaner(content) for content in contents]
+    return (time.perf_counter() - start_time) / (repeats * len(contents)), outputs
+
+
+def benchmark_cleaner(post_paths, repeats):
+    """ compares the streaming cleaner with the legacy cleaner
+
+    Args:
+        post_paths (list): paths of the posts
+        repeats (int): number of times every post is cleaned
+
+    Returns:
+        dict: the results
+    """
+    contents = [tagger.load_post(post_path).content for post_path in post_paths]
+    megabytes = sum(len(content.encode('utf-8')) for content in contents) / 1e6
+    results = {'posts': len(contents), 'megabytes': round(megabytes, 3)}
+    outputs = {}
+    for name, cleaner in (('markdown', tagger.clean_post_text_legacy), ('streaming', tagger.clean_markdown)):
+        seconds_per_post, outputs[name] = time_cleaner(cleaner, contents, repeats)
+        results[name] = {
+            'ms_per_post': round(seconds_per_post * 1000, 3),
+            'mb_per_sec': round(megabytes / (seconds_per_post * len(contents)), 2)}
+    results['speedup'] = round(results['markdown']['ms_per_post'] / max(results['streaming']['ms_per_post'], 1e-9), 2)
+
+    # Parity: the words of the streaming output should be (nearly) the same as those of the legacy output,
+    # the legacy cleaner keeps the fenced code so that is left out of its input
+    similarities = []
+    for post_path, content, streaming_text in zip(post_paths, contents, outputs['streaming']):
+        legacy_words = word_set(tagger.clean_post_text_legacy(FENCED_CODE_PATTERN.sub('', content)))
+        streaming_words = word_set(streaming_text)
+        union = legacy_words | streaming_words
+        similarities.append((len(legacy_words & streaming_words) / len(union) if union else 1.0, post_path))
+    results['parity'] = {
+        'mean_jaccard': round(sum(similarity for similarity, _ in similarities) / len(similarities), 3),
+        'lowest': [{'post': post_path, 'jaccard': round(similarity, 3)} for similarity, post_path in sorted(similarities)[:5]]}
+    return results
+
+
+def benchmark_backends(post_paths, repeats):
+    """ compares the PyTorch embedding backend with the ONNX Runtime int8 backend
+
+    Args:
+        post_paths (list): paths of the posts
+        repeats (int): number of times the key phrases of every post are extracted
+
+    Returns:
+        dict: the results
+    """
+    settings = tagger.load_settings()
+    texts = [tagger.clean_post_text(tagger.load_post(post_path).content, settings['text_cleaner']) for post_path in post_paths]
+    results = {'posts': len(texts)}
+    keyphrases = {}
+    for backend in ('torch', 'onnx-int8'):
+        # Measure the model itself, not the embedding cache
+        backend_settings = {
+            **settings,
+            'embedding_backend': {**settings.get('embedding_backend', {}), 'name': backend},
+            'embedding_cache': {'enabled': False}}
+        start_time = time.perf_counter()
+        vectorizer, kw_model = tagger.load_models(backend_settings, verbose=False)
+        load_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            keyphrases[backend] = [
+                tagger.extract_keyphrases([text], vectorizer, kw_model, settings['key_phrase_output_count'], settings.get('chunking'))[0] for text in texts]
+        seconds_per_post = (time.perf_counter() - start_time) / (repeats * len(texts))
+        results[backend] = {'load_seconds': round(load_seconds, 3), 'ms_per_post': round(seconds_per_post * 1000, 3)}
+    results['speedup'] = round(results['torch']['ms_per_post'] / max(results['onnx-int8']['ms_per_post'], 1e-9), 2)
+
+    # Agreement: the share of the PyTorch top-N key phrases that ONNX also returns
+    agreements = []
+    for torch_keyphrases, onnx_keyphrases in zip(keyphrases['torch'], keyphrases['onnx-int8']):
+        torch_set = {keyphrase for keyphrase, _ in torch_keyphrases}
+        onnx_set = {keyphrase for keyphrase, _ in onnx_keyphrases}
+        agreements.append(len(torch_set & onnx_set) / len(torch_set) if torch_set else 1.0)
+    results['top_n_agreement'] = {'mean': round(sum(agreements) / len(agreements), 3), 'min': round(min(agreements), 3)}
+    return results
+
+
+def benchmark_writer(post_paths, repeats, size_mb):
+    """ compares the minimal-rewrite frontmatter writer with the legacy writer and checks the round-trip of every post
+
+    Args:
+        post_paths (list): paths of the posts
+        repeats (int): number of times the tags of every post are written
+        size_mb (float): the body of every post is padded to this size in megabytes, 0 to keep the posts as they are
+
+    Returns:
+        dict: the results
+    """
+    tags = ['BenchmarkTag', 'AnotherTag', 'Jekyll']
+    results = {'posts': len(post_paths), 'size_mb': size_mb}
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        copies = []
+        for number, post_path in enumerate(post_paths):
+            copy_path = os.path.join(temp_dir, f'{number}.md')
+            shutil.copyfile(post_path, copy_path)
+            if size_mb > 0:
+                with open(copy_path, 'a', encoding='utf8') as copy_file:
+                    paragraph = 'Padding paragraph to simulate a large post about Jekyll and Python.\n\n'
+                    copy_file.write(paragraph * int(size_mb * 1e6 / len(paragraph)))
+            copies.append(copy_path)
+
+        for name, writer in (('legacy', tagger.write_post_legacy), ('minimal', tagger.write_post)):
+            elapsed = 0.0
+            for _ in range(repeats):
+                for copy_path in copies:
+                    # Reading the post is the same for both writers, only the writing is timed
+                    post = tagger.load_post(copy_path)
+                    start_time = time.perf_counter()
+                    writer(copy_path, post, tags)
+                    elapsed += time.perf_counter() - start_time
+            results[name] = {'ms_per_post': round(elapsed * 1000 / (repeats * len(copies)), 3)}
+        results['speedup'] = round(results['legacy']['ms_per_post'] / max(results['minimal']['ms_per_post'], 1e-9), 2)
+
+        # Round-trip on fresh copies: only the tags may change
+        for post_path in post_paths:
+            copy_path = os.path.join(temp_dir, 'round_trip.md')
+            shutil.copyfile(post_path, copy_path)
+            before = tagger.load_post(copy_path)
+            tagger.write_post(copy_path, tagger.load_post(copy_path), tags)
+            after = tagger.load_post(copy_path)
+            expected_keys = list(before.metadata.keys()) + ([] if 'tags' in before.metadata else ['tags'])
+            if after.content != before.content or after.metadata.get('tags') != tags or list(after.metadata.keys()) != expected_keys \
+                    or any(after.metadata[key] != value for key, value in before.metadata.items() if key != 'tags'):
+                failures.append(post_path)
+    results['round_trip'] = {'checked': len(post_paths), 'failures': failures}
+    return results
+
+
+def benchmark_pipeline(post_paths, repeats):
+    """ measures the cold start, warm latency per post, batch throughput and peak memory of the tagger
+
+    Args:
+        post_paths (list): paths of the posts
+        repeats (int): number of times every post is tagged for the warm latency
+
+    Returns:
+        dict: the results
+    """
+    # Measure the models, not the embedding cache or the tag index
+    settings = tagger.load_settings()
+    settings['embedding_cache'] = {'enabled': False}
+    contents = [tagger.load_post(post_path).content for post_path in post_paths]
+    words = sum(len(content.split()) for content in contents)
+    results = {'posts': len(contents), 'mean_words_per_post': round(words / len(contents), 1), 'settings': {
+        key: settings.get(key) for key in ('nlp_models', 'key_phrase_output_count', 'batch_size', 'text_cleaner', 'embedding_backend', 'chunking')}}
+
+    # Cold start: a fresh process, as when the VSCode task runs the tagger on a single post
+    start_time = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', COLD_START_CODE, os.path.dirname(os.path.abspath(tagger.__file__)), post_paths[0]],
+        capture_output=True, text=True, env=os.environ.copy(), check=False)
+    cold_seconds = time.perf_counter() - start_time
+    if completed.returncode != 0:
+        raise RuntimeError(f'The cold start process failed: {completed.stderr.strip()}')
+    cold_start = json.loads(completed.stdout.strip().splitlines()[-1])
+    results['cold_start'] = {'seconds': round(cold_seconds, 3), **{key: round(value, 3) if value is not None else None for key, value in cold_start.items()}}
+
+    # Warm: one post at a time with loaded models
+    start_time = time.perf_counter()
+    models = tagger.load_models(settings, verbose=False)
+    results['load_seconds'] = round(time.perf_counter() - start_time, 3)
+    latencies = []
+    for _ in range(repeats):
+        for content in contents:
+            start_time = time.perf_counter()
+            tagger.extract_tags(tagger.clean_post_text(content, settings['text_cleaner']), models, settings, verbose=False)
+            latencies.append(time.perf_counter() - start_time)
+    latencies.sort()
+    results['warm'] = {
+        'mean_ms_per_post': round(statistics.mean(latencies) * 1000, 3),
+        'median_ms_per_post': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms_per_post': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3)}
+
+    # Batch: as the directory mode, 'batch_size' posts per call
+    batch_size = settings['batch_size']
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for first in range(0, len(contents), batch_size):
+            texts = [tagger.clean_post_text(content, settings['text_cleaner']) for content in contents[first:first + batch_size]]
+            batch_keyphrases = tagger.extract_keyphrases(texts, models[0], models[1], settings['key_phrase_output_count'], settings.get('chunking'))
+            tagger.keyphrases_to_tags(batch_keyphrases, models[1].model.embed, None)
+    batch_seconds = time.perf_counter() - start_time
+    results['batch'] = {'batch_size': batch_size, 'posts_per_sec': round(repeats * len(contents) / max(batch_seconds, 1e-9), 2)}
+    tagger.close_models(models[1])
+    results['peak_rss_mb'] = tagger.peak_rss_mb()
+    return results
+
+
+def compare_with_baseline(results, baseline):
+    """ compares every number in the results with the same number in the baseline
+
+    Args:
+        results (dict): the results of this run
+        baseline (dict): the results of an earlier run (of the same benchmark)
+
+    Returns:
+        dict: per number (as a dotted path) the baseline, the current value and the change in percent
+    """
+    comparison = {}
+
+    def walk(current, previous, path):
+        if isinstance(current, dict) and isinstance(previous, dict):
+            for key, value in current.items():
+                if key in previous:
+                    walk(value, previous[key], f'{path}.{key}' if path else key)
+        elif isinstance(current, (int, float)) and isinstance(previous, (int, float)) \
+                and not isinstance(current, bool) and not isinstance(previous, bool):
+            comparison[path] = {
+                'baseline': previous,
+                'current': current,
+                'change_percent': round((current - previous) * 100 / previous, 1) if previous else None}
+
+    walk(results, baseline, '')
+    return comparison
+
+
+def main(argv):
+    """ processes the CLI input and runs the benchmark
+
+    Args:
+        argv (list): CLI arguments
+    """
+    # Init Variables
+    benchmark: str = 'cleaner'
+    input_pattern: str | None = None
+    repeats: int = 5
+    size_mb: float = 0
+    corpus_posts: int = 0
+    seed: int = 42
+    online: bool = False
+    baseline_output_path: str | None = None
+    baseline_input_path: str | None = None
+    help_message: str = 'benchmark_add_keyphrases.py -b <' + '|'.join(BENCHMARKS) + '> -d <posts_directory_or_glob> | -g <posts> [-r <seed>]' + \
+        ' [-n <repeats>] [-s <size_mb>] [-o <baseline.json>] [-c <baseline.json>] [--online]'
+
+    # Processing CLI input
+    try:
+        opts, args = getopt.getopt(argv,"hb:d:n:s:g:r:o:c:",
+            ["help","benchmark=","dir=","repeats=","size=","generate=","seed=","output-baseline=","compare=","online"])
+    except getopt.GetoptError:
+        print(help_message)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print(help_message)
+            sys.exit()
+        elif opt in ("-b", "--benchmark"):
+            benchmark = str(arg)
+        elif opt in ("-d", "--dir"):
+            input_pattern = str(arg)
+        elif opt in ("-n", "--repeats"):
+            try:
+                repeats = max(1, int(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-s", "--size"):
+            try:
+                size_mb = max(0.0, float(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-g", "--generate"):
+            try:
+                corpus_posts = max(1, int(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-r", "--seed"):
+            try:
+                seed = int(arg)
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-o", "--output-baseline"):
+            baseline_output_path = str(arg)
+        elif opt in ("-c", "--compare"):
+            baseline_input_path = str(arg)
+        elif opt == "--online":
+            online = True
+    if benchmark not in BENCHMARKS or (input_pattern is None and corpus_posts == 0):
+        print(help_message)
+        sys.exit(2)
+    if not online:
+        # Before the models are imported, the cold start process inherits the environment
+        os.environ.update(OFFLINE_ENVIRONMENT)
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        if corpus_posts > 0:
+            post_paths = generate_corpus(corpus_dir, corpus_posts, seed)
+        else:
+            post_paths = list(tagger.iter_post_paths(input_pattern))
+        if not post_paths:
+            print('No markdown posts found. Exiting...')
+            sys.exit(2)
+        if benchmark == 'backends':
+            results = benchmark_backends(post_paths, repeats)
+        elif benchmark == 'writer':
+            results = benchmark_writer(post_paths, repeats, size_mb)
+        elif benchmark == 'pipeline':
+            results = benchmark_pipeline(post_paths, repeats)
+        else:
+            results = benchmark_cleaner(post_paths, repeats)
+    results = {
+        'benchmark': benchmark,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'corpus': {'generated_posts': corpus_posts, 'seed': seed} if corpus_posts > 0 else {'pattern': input_pattern},
+        'repeats': repeats,
+        **results}
+
+    if baseline_input_path is not None:
+        with open(baseline_input_path, 'r', encoding='utf8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('benchmark') != benchmark:
+            print(f"The baseline is of the '{baseline.get('benchmark')}' benchmark, not of '{benchmark}'. Exiting...")
+            sys.exit(2)
+        if baseline.get('corpus') != results['corpus']:
+            print('Warning: the baseline was measured on a different corpus.', file=sys.stderr)
+        results['comparison'] = compare_with_baseline(results, baseline)
+    print(json.dumps(results, indent=2))
+    if baseline_output_path is not None:
+        with open(baseline_output_path, 'w', encoding='utf8') as baseline_file:
+            json.dump({key: value for key, value in results.items() if key != 'comparison'}, baseline_file, indent=2)
+        print('Baseline written to:', baseline_output_path, file=sys.stderr)
+
+
+# Start main thread
+if __name__ == "__main__":
+    main(sys.argv[1:])
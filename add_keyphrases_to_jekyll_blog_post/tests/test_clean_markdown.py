@@ -0,0 +1,94 @@
+"""
+Regression tests of the streaming markdown cleaner ('text_cleaner': 'streaming') of 'add_keyphrases_to_jekyll_blog_post.py'.
+
+Every case is a fixed markdown input with its expected plain text. When 'markdown' and 'bs4' are installed,
+the words of the streaming output are also compared with those of the legacy cleaner ('text_cleaner': 'markdown').
+
+Example:
+python -m unittest discover -s tests
+"""
+
+# Import modules
+import os
+import re
+import sys
+import unittest
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import add_keyphrases_to_jekyll_blog_post as tagger  # noqa: E402
+
+
+# Define constants
+## (name, markdown, expected plain text)
+CASES = [
+    ('one-line raw block',
+     '{% raw %}`{{ page.title }}`{% endraw %} prints the title.\n\nThe rest of a long post.',
+     ' prints the title.\n\nThe rest of a long post.'),
+    ('inline comment block',
+     'A {% comment %} hidden remark {% endcomment %} note.',
+     'A  note.'),
+    ('one-line highlight block',
+     '{% highlight bash %}bundle exec jekyll serve{% endhighlight %}\nServe the site.',
+     '\nServe the site.'),
+    ('multi-line comment block',
+     'Before.\n{% comment %}\nHidden remark.\n{% endcomment %}\nAfter.',
+     'Before.\nAfter.'),
+    ('highlight block with a backtick fence inside',
+     '{% highlight markdown %}\n```python\nx = 1\n```\n{% endhighlight %}\nShown.',
+     'Shown.'),
+    ('nested backtick fences',
+     'Intro.\n\n````markdown\n```python\nprint(1)\n```\n````\n\nOutro.',
+     'Intro.\n\n\nOutro.'),
+    ('backtick fence inside a tilde fence',
+     '~~~\n```\nhidden\n~~~\nShown.',
+     'Shown.'),
+    ('link references',
+     'See [the docs][docs] and [GitHub](https://github.com).\n\n[docs]: https://example.com/docs "Docs"',
+     'See the docs and GitHub.\n'),
+    ('footnotes',
+     'A claim[^1] and another[^note].\n\n[^1]: The first footnote.\n[^note]: The second footnote.',
+     'A claim and another.\n\nThe first footnote.\nThe second footnote.'),
+    ('block and inline markup',
+     '# Heading #\n\n> **Bold** and _snake_case_ with `code` &amp; ![img](a.png)\n\n---\n\n* Item {{ site.url }}',
+     'Heading\n\nBold and snake_case with code & \n\n\nItem '),
+]
+## Cases the legacy cleaner gets wrong: it keeps fenced code, comment blocks, link reference definitions and named footnote references
+LEGACY_DIFFERENCES = {'nested backtick fences', 'backtick fence inside a tilde fence', 'highlight block with a backtick fence inside',
+                      'inline comment block', 'multi-line comment block', 'link references', 'footnotes'}
+
+
+# Define classes
+class CleanMarkdownTest(unittest.TestCase):
+    """ fixed markdown inputs with their expected plain text """
+
+    def test_cases(self):
+        for name, md_text, expected in CASES:
+            with self.subTest(name):
+                self.assertEqual(tagger.clean_markdown(md_text), expected)
+
+    def test_text_after_one_line_blocks_is_kept(self):
+        post = '\n\n'.join(['{% raw %}{{ x }}{% endraw %} Start.', '{% comment %}c{% endcomment %}'] + [f'Paragraph {number}.' for number in range(100)])
+        self.assertEqual(len(re.findall(r'Paragraph \d+\.', tagger.clean_markdown(post))), 100)
+
+    def test_unclosed_block_drops_the_rest(self):
+        self.assertEqual(tagger.clean_markdown('Shown.\n{% highlight bash %}\nls\nstill code'), 'Shown.')
+
+
+@unittest.skipUnless(importlib.util.find_spec('markdown') and importlib.util.find_spec('bs4'), 'needs markdown and bs4')
+class LegacyParityTest(unittest.TestCase):
+    """ the streaming cleaner keeps the same words as the legacy cleaner """
+
+    def test_words(self):
+        for name, md_text, _ in CASES:
+            if name in LEGACY_DIFFERENCES:
+                continue
+            with self.subTest(name):
+                legacy_words = set(re.findall(r'\w+', tagger.clean_post_text_legacy(md_text).lower()))
+                streaming_words = set(re.findall(r'\w+', tagger.clean_markdown(md_text).lower()))
+                self.assertEqual(streaming_words, legacy_words)
+
+
+# Start main thread
+if __name__ == "__main__":
+    unittest.main()
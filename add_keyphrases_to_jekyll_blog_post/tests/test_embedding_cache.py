@@ -0,0 +1,71 @@
+"""
+Tests of the persistent embedding cache ('embedding_cache' in 'nlp.json') of 'add_keyphrases_to_jekyll_blog_post.py'.
+
+'CachedEmbedder.embed' runs through a miss, a hit and the LRU eviction with a fake embedding backend that counts the texts
+sent to the model.
+
+Example:
+python -m unittest discover -s tests
+"""
+
+# Import modules
+import os
+import sys
+import tempfile
+import unittest
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import add_keyphrases_to_jekyll_blog_post as tagger  # noqa: E402
+
+
+# Define classes
+class FakeEmbedder:
+    """ embedding backend that returns the length of a text and records every text it embeds """
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, documents, verbose=False):
+        import numpy as np
+        self.embedded.extend(documents)
+        return np.array([[len(document), 1.0] for document in documents], dtype=np.float32)
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'needs numpy')
+class CachedEmbedderTest(unittest.TestCase):
+    """ miss -> hit -> eviction through 'CachedEmbedder.embed' """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = tagger.EmbeddingCache(os.path.join(directory.name, 'cache.sqlite'), 'fake-model', max_entries=2)
+        self.addCleanup(self.cache.connection.close)
+        # Evict on every insert over 'max_entries'
+        self.cache.eviction_margin = 0
+        self.backend = FakeEmbedder()
+        self.embedder = tagger.CachedEmbedder(self.backend, self.cache)
+
+    def test_miss_hit_eviction(self):
+        first = self.embedder.embed(['jekyll', 'keyphrase'])
+        self.assertEqual(first.tolist(), [[6.0, 1.0], [9.0, 1.0]])
+        self.assertEqual(self.backend.embedded, ['jekyll', 'keyphrase'])
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+        # Same texts, normalized whitespace: served from the cache
+        second = self.embedder.embed(['jekyll', ' keyphrase '])
+        self.assertEqual(second.tolist(), first.tolist())
+        self.assertEqual(self.backend.embedded, ['jekyll', 'keyphrase'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+        # 'jekyll' is used again, so 'keyphrase' is the least recently used embedding and gets evicted
+        self.embedder.embed(['jekyll'])
+        self.embedder.embed(['blog'])
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.embedder.embed(['jekyll', 'keyphrase'])
+        self.assertEqual(self.backend.embedded, ['jekyll', 'keyphrase', 'blog', 'keyphrase'])
+
+
+# Start main thread
+if __name__ == "__main__":
+    unittest.main()
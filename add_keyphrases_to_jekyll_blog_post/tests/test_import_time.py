@@ -0,0 +1,87 @@
+"""
+Import-time budget of 'add_keyphrases_to_jekyll_blog_post.py': '-h' and argument validation must not import the NLP modules
+and must start well under 100 ms.
+
+Example:
+python -m unittest discover -s tests
+"""
+
+# Import modules
+import os
+import sys
+import time
+import tempfile
+import unittest
+import subprocess
+
+
+# Define constants
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'add_keyphrases_to_jekyll_blog_post.py')
+HEAVY_MODULES = {'numpy', 'torch', 'keybert', 'keyphrase_vectorizers', 'markdown', 'bs4', 'frontmatter', 'spacy'}
+BUDGET_SECONDS = 0.1
+RUNS = 3
+
+
+# Define functions
+def run_script(args, importtime=False):
+    """ runs the script in a new interpreter
+
+    Args:
+        args (list): CLI arguments
+        importtime (bool, optional): run with '-X importtime'. Defaults to False.
+
+    Returns:
+        tuple: the completed process and the wall time in seconds
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [SCRIPT_PATH] + args
+    start_time = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(SCRIPT_PATH), check=False)
+    return completed, time.perf_counter() - start_time
+
+
+def imported_modules(importtime_output):
+    """ returns the modules and their own import time (in seconds) from the '-X importtime' output
+
+    Args:
+        importtime_output (str): stderr of the interpreter
+
+    Returns:
+        dict: module name to seconds
+    """
+    modules = {}
+    for line in importtime_output.splitlines():
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            self_us, _, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = int(self_us) / 1e6
+    return modules
+
+
+# Define classes
+class ImportTimeTest(unittest.TestCase):
+    """ '-h' and the rejection of a non-markdown input stay fast """
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as text_file:
+            text_file.write('Not a post')
+        self.addCleanup(os.remove, text_file.name)
+        self.cases = {'help': (['-h'], 0), 'not markdown': (['-i', text_file.name], 2)}
+
+    def test_no_heavy_imports(self):
+        for name, (args, exit_status) in self.cases.items():
+            with self.subTest(name):
+                completed, _ = run_script(args, importtime=True)
+                self.assertEqual(completed.returncode, exit_status, completed.stdout)
+                modules = imported_modules(completed.stderr)
+                self.assertFalse({module.split('.')[0] for module in modules} & HEAVY_MODULES)
+                self.assertLess(sum(modules.values()), BUDGET_SECONDS)
+
+    def test_wall_time(self):
+        for name, (args, _) in self.cases.items():
+            with self.subTest(name):
+                # The fastest of a few runs, a busy machine should not fail the test
+                self.assertLess(min(run_script(args)[1] for _ in range(RUNS)), BUDGET_SECONDS)
+
+
+# Start main thread
+if __name__ == "__main__":
+    unittest.main()
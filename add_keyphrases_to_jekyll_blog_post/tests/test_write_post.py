@@ -0,0 +1,105 @@
+"""
+Round-trip tests of the frontmatter writer ('write_post') of 'add_keyphrases_to_jekyll_blog_post.py'.
+
+Every case is a fixed post with the bytes expected after writing the new tags: only the top-level 'tags' key may change,
+the other frontmatter keys, their order, the line endings and the body stay byte-identical. The post is replaced atomically.
+
+Example:
+python -m unittest discover -s tests
+"""
+
+# Import modules
+import os
+import sys
+import stat
+import tempfile
+import unittest
+import importlib.util
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import add_keyphrases_to_jekyll_blog_post as tagger  # noqa: E402
+
+
+# Define constants
+TAGS = ['Jekyll', 'Key Phrase']
+TAGS_BLOCK = b'tags:\n- Jekyll\n- Key Phrase\n'
+## (name, post, expected post)
+CASES = [
+    ('block list',
+     b'---\ntitle: A post\ntags:\n- old\n- other\ndate: 2023-01-01\n---\nBody\n---\ntags: in the body\n',
+     b'---\ntitle: A post\n' + TAGS_BLOCK + b'date: 2023-01-01\n---\nBody\n---\ntags: in the body\n'),
+    ('flow list',
+     b'---\ntitle: A post\ntags: [old, other]\nlayout: post\n---\nBody\n',
+     b'---\ntitle: A post\n' + TAGS_BLOCK + b'layout: post\n---\nBody\n'),
+    ('indented block list',
+     b'---\ntags:\n  - old\n  - other\n\ntitle: "A: post"\n---\nBody\n',
+     b'---\n' + TAGS_BLOCK + b'\ntitle: "A: post"\n---\nBody\n'),
+    ('CRLF line endings',
+     b'---\r\ntitle: A post\r\ntags: [old]\r\ncategories: [blog]\r\n---\r\nBody\r\n',
+     b'---\r\ntitle: A post\r\n' + TAGS_BLOCK.replace(b'\n', b'\r\n') + b'categories: [blog]\r\n---\r\nBody\r\n'),
+    ('nested tags key',
+     b'---\nseo:\n  tags: keep\n  type: BlogPosting\ntitle: A post\n---\nBody\n',
+     b'---\nseo:\n  tags: keep\n  type: BlogPosting\ntitle: A post\n' + TAGS_BLOCK + b'---\nBody\n'),
+    ('tags_extra is another key',
+     b'---\ntags_extra: [keep]\ntitle: A post\n---\nBody\n',
+     b'---\ntags_extra: [keep]\ntitle: A post\n' + TAGS_BLOCK + b'---\nBody\n'),
+    ('no frontmatter',
+     b'Body\n\nMore body.\n',
+     b'---\n' + TAGS_BLOCK + b'---\nBody\n\nMore body.\n'),
+]
+
+
+# Define classes
+@unittest.skipUnless(importlib.util.find_spec('frontmatter') and importlib.util.find_spec('yaml'), 'needs python-frontmatter and PyYAML')
+class WritePostTest(unittest.TestCase):
+    """ only the 'tags' key is patched and the post is replaced atomically """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.post_path = os.path.join(self.directory, '2023-01-01-post.md')
+
+    def write(self, content):
+        with open(self.post_path, 'wb') as post_file:
+            post_file.write(content)
+
+    def read(self):
+        with open(self.post_path, 'rb') as post_file:
+            return post_file.read()
+
+    def test_cases(self):
+        for name, content, expected in CASES:
+            with self.subTest(name):
+                self.write(content)
+                tagger.write_post(self.post_path, tagger.load_post(self.post_path), TAGS)
+                self.assertEqual(self.read(), expected)
+                self.assertEqual(tagger.load_post(self.post_path)['tags'], TAGS)
+
+    def test_post_is_replaced(self):
+        content, expected = CASES[0][1], CASES[0][2]
+        self.write(content)
+        os.chmod(self.post_path, 0o640)
+        inode = os.stat(self.post_path).st_ino
+        tagger.write_post(self.post_path, tagger.load_post(self.post_path), TAGS)
+        self.assertEqual(self.read(), expected)
+        # A new file (the temporary file) took the place of the post, with the mode of the post
+        self.assertNotEqual(os.stat(self.post_path).st_ino, inode)
+        self.assertEqual(stat.S_IMODE(os.stat(self.post_path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(self.post_path)])
+
+    def test_failed_write_keeps_the_post(self):
+        content = CASES[0][1]
+        self.write(content)
+        post = tagger.load_post(self.post_path)
+        with mock.patch.object(tagger.shutil, 'copyfileobj', side_effect=OSError('No space left on device')):
+            with self.assertRaises(OSError):
+                tagger.write_post(self.post_path, post, TAGS)
+        self.assertEqual(self.read(), content)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(self.post_path)])
+
+
+# Start main thread
+if __name__ == "__main__":
+    unittest.main()
@@ -28,6 +28,8 @@ https://docs.github.com/en/graphql/guides/using-the-graphql-api-for-discussions
 https://gist.github.com/gbaman/b3137e18c739e0cf98539bf4ec4366ad
 https://gist.github.com/StevenACoffman/ffcc754f7f84a69efcb84442eca302e0
 https://github.com/giscus/giscus#readme
+https://docs.github.com/en/graphql/overview/rate-limits-and-node-limits-for-the-graphql-api
+https://docs.github.com/en/rest/git/trees#get-a-tree
 
 Image Sources:
 None
@@ -42,22 +44,67 @@ Tested on:
 ** OS: Windows 10 21H2
 ** Python3: 3.9.5
 
+The discussions are fetched in pages of 100 (the maximum of the GitHub GraphQL API), following the cursor until the last page,
+so blogs with more than 100 discussions do not get duplicate discussions. Only the id, number, title and state of the discussions are fetched (not their body).
+The posts are reconciled with the discussions into a plan: discussions to create (for posts without one), to retitle (for renamed posts, recognized by the blob oid
+of the post in the previous run) and to close (for discussions without a post, only with '--close-orphaned'). The plan is shown as a diff, '-n' (or '--dry-run') only shows it.
+The plan is applied in batches: every request contains up to 25 aliased createDiscussion, updateDiscussion or closeDiscussion mutations.
+The results and errors are mapped back to the posts by their alias and only the mutations that failed with an error of their alias are retried (twice).
+A batch without a result (ie. a dropped connection or a bad gateway) may have been applied anyway, so the discussions it would create are looked up by their title
+(among the discussions updated since the last run) before they are created again.
+All calls go through a rate limit scheduler: token buckets throttle the calls upfront (within the 2,000 points per minute GitHub allows for GraphQL, where a call
+with mutations costs 5 points, the 900 points per minute it allows for REST and the 80 discussions per minute it allows to be created),
+the calls pause until the reset when the hourly budget ('X-RateLimit-Remaining') runs out and secondary rate limits (403/429, 'Retry-After') and bad gateways (502)
+are retried with an exponential backoff with jitter. Calls with mutations are only retried on secondary rate limits, which GitHub answers before running anything:
+a bad gateway or a dropped connection may come after the mutations were applied. The metrics of the scheduler are shown at the end.
+All calls share one pooled session, so the connections are kept alive and reused. The posts and the discussions are fetched at the same time
+and at most 2 batches of mutations are in flight at the same time. Nothing runs when the module is imported, so it can be driven from another script,
+ie. with a 'GitHubClient' pointing to a local stub server.
+The posts are discovered with one call to the git trees API for the posts tree (recursively, so posts in subfolders of '_posts' are included) of the default branch,
+'-r' (or 'blog_branch' in the password tool entry) selects another branch and '-p' (or 'posts_dir') another posts folder.
+With '-l' the posts are enumerated from a local checkout of the blog repository (ie. in CI) instead, so only the discussions are fetched from GitHub.
+In both modes the title of the discussion of a post is derived from the 'permalink' in its frontmatter when present, otherwise from its file name.
+Without a local checkout the content of the new and changed posts is fetched for this, 100 posts per GraphQL call, and the permalinks are kept in the local index by blob oid.
+The posts and their discussions (id and number) are kept in a local index ('auto_discussion_state.json'). Every run starts with one cheap call that returns the oid of the
+'_posts' tree and the number and last update of the discussions. The posts are only fetched again when the sha of the tree changed and only the discussions updated since the last run
+are fetched (all discussions when some were deleted), so a run without changes takes one request.
+
 Example:
 auto_discussion_for_jekyl_blog_post.py
+This will add a discussion for every blog post that does not have one.
+auto_discussion_for_jekyl_blog_post.py -b 10 -c 1
+This will create the missing discussions with 10 mutations per request, one request at a time.
+auto_discussion_for_jekyl_blog_post.py -n --close-orphaned
+This will show the discussions that would be created, retitled and closed, without changing anything.
+auto_discussion_for_jekyl_blog_post.py -f -s /home/user/auto_discussion_state.json
+This will fetch all posts and discussions, ignoring (and then rebuilding) the local index in the given state file.
+auto_discussion_for_jekyl_blog_post.py -r main -p _posts/blog
+This will look for the posts in the '_posts/blog' folder (and its subfolders) of the 'main' branch.
+auto_discussion_for_jekyl_blog_post.py -l /home/user/myorg.github.io
+This will enumerate the posts from the '_posts' folder of the local checkout instead of calling the git trees API.
 """
 from __future__ import annotations
 import sys
-from datetime import datetime, timezone
+import getopt
 import subprocess
 import time
+import random
+import threading
 import logging
 import re
+import os
+import hashlib
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 
 
 #######################################
 # LOAD ACCESS TOKEN AND OTHER VARIABLES
 # IMPORTANT: You will need to have a CLI password tool installed, this will fetch the 6 variables securely.
+# The optional variables 'blog_branch' (default 'HEAD', the default branch) and 'posts_dir' (default '_posts') can be added as well.
 # IMPORTANT: Variable names should be identical to your 'password tool' entry keys (left of the equals sign) OR adjust accordingly
 # ENTRY EXAMPLE (ie. password is always on line 1):
 """
@@ -70,164 +117,1051 @@ discussion_repo_id=vk_klhFkf76cn
 discussion_category_id=DIC_jsfbvnJBbvjd98
 """
 #######################################
-github_token = ""
-repo_owner = ""
-blog_repo_name = ""
-discussion_repo_name = ""
-discussion_repo_id = ""
-discussion_category_id = ""
-blogsite_url = ""
-real_requests_post = requests.post
-
-# The below routine is valid when using my CLI password manager. Adjust accordingly
-p1 = subprocess.Popen(
-    ["pass", "github/github-pages-auto-discussion"], stdout=subprocess.PIPE)
-i = 0
-for pass_line in (str(p1.communicate())[3:-10]).split('\\n'):
-    #print("line", i, pass_line)
-    if i == 0:
-        github_token = pass_line
-    else:
-        var_key = pass_line.split('=')[0]
-        var_value = pass_line.split('=')[1]
-        locals()[var_key] = var_value
-    i = i + 1
 
 
 ##################
-# DEFINE FUNCTIONS
+# DEFINE CONSTANTS
 ##################
-def wrap_requests_post(*args, **kwargs):
-    """ executes the graphql call and shows rate limit info for each call
-
-    Returns:
-        dict: response
-    """
-    if 'headers' not in kwargs:
-        kwargs['headers'] = {}
-    kwargs['headers']['Authorization'] = 'token ' + github_token
-    response = real_requests_post(*args, **kwargs)
-    if 'x-ratelimit-used' in response.headers._store:
-        print("ratelimit status: used %s of %s. next reset in %s minutes" % (
-            response.headers['X-RateLimit-Used'],
-            response.headers['X-RateLimit-Limit'],
-            datetime.fromtimestamp(int(
-                response.headers["X-RateLimit-Reset"]) - time.time(), tz=timezone.utc).strftime("%M:%S")
-        ))
-    return response
-
-
-requests.post = wrap_requests_post
-
-
-#################################
-# ROUTINE TO FETCH ALL BLOG POSTS
-#################################
-query = """
-{ repository(owner: "<REPO_OWNER>", name: "<BLOG_REPO_NAME>") {
-    object(expression: "master:_posts/") {
-        ... on Tree {
-            entries {
-                name
+GRAPHQL_URL = 'https://api.github.com/graphql'
+REST_URL = 'https://api.github.com'
+# Number of createDiscussion mutations per request (see '-b')
+MUTATION_BATCH_SIZE = 25
+# Maximum number of requests in flight (see '-c')
+CONCURRENCY = 2
+# The 'permalink' in the frontmatter of a post, unless it contains Jekyll placeholders (ie. '/:categories/:title/')
+PERMALINK_PATTERN = re.compile(r'^permalink\s*:\s*[\'"]?([^\'":\s]+)[\'"]?\s*$')
+# Input types of the discussion mutations
+MUTATION_INPUT_TYPES = {
+    'createDiscussion': 'CreateDiscussionInput',
+    'updateDiscussion': 'UpdateDiscussionInput',
+    'closeDiscussion': 'CloseDiscussionInput'}
+# Number of posts of which the content is fetched per request (to read their 'permalink')
+BLOB_BATCH_SIZE = 100
+# Local index of the posts and their discussions (see '-s')
+STATE_FILE_NAME = 'auto_discussion_state.json'
+DISCUSSIONS_QUERY = """
+query($owner: String!, $name: String!, $categoryId: ID!, $first: Int!, $after: String) {
+    repository(owner: $owner, name: $name) {
+        discussions(first: $first, after: $after, categoryId: $categoryId, orderBy: {field: UPDATED_AT, direction: DESC}) {
+            pageInfo {
+                hasNextPage
+                endCursor
             }
-        }
-    }
-} }
-""".replace("<REPO_OWNER>", repo_owner).replace("<BLOG_REPO_NAME>", blog_repo_name)
-
-# place the call
-response = requests.post(
-    'https://api.github.com/graphql', json={'query': query})
-data = response.json()
-# print(data)
-
-# Parse JSON data
-try:
-    print('Number of posts: ', len(
-        data["data"]["repository"]["object"]["entries"]))
-except Exception as e:
-    logging.error("{e}\nThe data has no items")
-    sys.exit(2)
-
-# Transform post names so they correspond to the site Url
-blog_items: list = data["data"]["repository"]["object"]["entries"]
-expected_titles: list = []
-for blog_item in blog_items:
-    # remove chars
-    name: str = re.sub(r".md$", '', str(blog_item['name'])[11:])
-    # add chars
-    name = 'blog/' + name + '/'
-    expected_titles.append(name)
-# print(expected_titles)
-
-
-##################################
-# ROUTINE TO FETCH ALL DISCUSSIONS
-##################################
-query = """
-{ repository(owner:"<REPO_OWNER>", name:"<DISCUSSION_REPO_NAME>") {
-    discussions(first: 100, after: null, categoryId: "<CATEGORYID>") {
-        totalCount
-        edges {
-            cursor
-            node {
+            nodes {
                 id
+                number
+                title
+                closed
+                updatedAt
             }
         }
-        nodes {
-            id
-            title
-            body
-            number
-            url
+    }
+}
+"""
+# One cheap call to find out what changed since the last run: the oid of the posts tree (ie. 'HEAD:_posts') and the number and last update of the discussions
+CHANGES_QUERY = """
+query($owner: String!, $blogName: String!, $postsExpression: String!, $withPosts: Boolean!, $discussionName: String!, $categoryId: ID!) {
+    blog: repository(owner: $owner, name: $blogName) @include(if: $withPosts) {
+        object(expression: $postsExpression) {
+            oid
         }
     }
-} }
-""".replace("<REPO_OWNER>", repo_owner).replace("<DISCUSSION_REPO_NAME>", discussion_repo_name).replace("<CATEGORYID>", discussion_category_id)
-
-# place the call
-response = requests.post(
-    'https://api.github.com/graphql', json={'query': query})
-data = response.json()
-# print(data)
-
-# Parse JSON data
-try:
-    print('Number of discussions: ',
-          data["data"]["repository"]["discussions"]["totalCount"])
-except Exception as e:
-    logging.error("{e}\nThe data has no items")
-    sys.exit(2)
-
-discussion_items: list = data["data"]["repository"]["discussions"]["nodes"]
-actual_titles: list = []
-for discussion_item in discussion_items:
-    actual_titles.append(discussion_item['title'])
-# print(actual_titles)
-
-
-###############################################################
-# ROUTINE TO ADD NEW DISCUSSIONS FOR BLOGS THAT DO NOT HAVE ONE
-###############################################################
-for expected_title in expected_titles:
-    if expected_title not in actual_titles:
-        # set discussion variables
-        body = "# " + expected_title + "\n\nAsk me anything about this blog!\n\n" + \
-            blogsite_url + expected_title
-        query = """
-            mutation {
-                createDiscussion(input: {repositoryId: "<REPOSITORYID>", categoryId: "<CATEGORYID>", body: "<BODY>", title: "<EXPECTED_TITLE>" }) {
-                    discussion {
-                        id
-                    }
-                }
+    comments: repository(owner: $owner, name: $discussionName) {
+        discussions(first: 1, categoryId: $categoryId, orderBy: {field: UPDATED_AT, direction: DESC}) {
+            totalCount
+            nodes {
+                updatedAt
             }
-            """.replace("<REPOSITORYID>", discussion_repo_id).replace("<CATEGORYID>", discussion_category_id).replace("<BODY>", body).replace("<EXPECTED_TITLE>", expected_title)
-        # print(blogsite_url, expected_title, sep='')
-        print('Adding discussion for blog:', expected_title)
+        }
+    }
+}
+"""
+
+
+##################
+# DEFINE FUNCTIONS
+##################
+class TokenBucket:
+    """ a token bucket, refilled at a constant rate up to its capacity
+    """
+    def __init__(self, rate, capacity):
+        """ starts with a full bucket
+
+        Args:
+            rate (float): tokens per second
+            capacity (float): maximum number of tokens
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.refilled = time.monotonic()
+
+    def take(self, amount):
+        """ takes tokens from the bucket, an amount larger than the capacity waits for a full bucket and leaves it in debt
+
+        Args:
+            amount (float): number of tokens
+
+        Returns:
+            float: seconds to wait before the tokens may be used
+        """
+        if amount <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+        wait = max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+        self.tokens -= amount
+        return wait
+
+
+class RateLimitScheduler:
+    """ schedules the GitHub API calls within its rate limits:
+    * token buckets throttle the calls upfront: GitHub allows 2,000 points per minute for GraphQL (a call with mutations counts as 5 points),
+      900 points per minute for REST and 80 content creations (ie. discussions) per minute
+    * the primary budget of each API ('X-RateLimit-Remaining' and 'X-RateLimit-Reset') pauses the calls of that API until its reset when it runs out
+    * secondary limits (403 and 429 responses, 'Retry-After') and bad gateways (502) are retried with an exponential backoff with jitter,
+      calls that are not idempotent (ie. mutations) only on the secondary limits
+    """
+    def __init__(self, graphql_points_per_second=33.0, rest_points_per_second=15.0, burst=100.0, creations_per_minute=80.0,
+                 max_retries=6, base_delay=1.0, max_delay=120.0, reserve=10):
+        """ sets up the token buckets, the primary budget of an API is unknown until its first response
+
+        Args:
+            graphql_points_per_second (float, optional): refill rate of the points bucket of the GraphQL API (2,000 points per minute). Defaults to 33.0.
+            rest_points_per_second (float, optional): refill rate of the points bucket of the REST API (900 points per minute). Defaults to 15.0.
+            burst (float, optional): capacity of the points buckets. Defaults to 100.0.
+            creations_per_minute (float, optional): refill rate of the content creation bucket (with a capacity of a quarter of a minute). Defaults to 80.0.
+            max_retries (int, optional): number of retries of a call. Defaults to 6.
+            base_delay (float, optional): first backoff in seconds, doubled for every retry. Defaults to 1.0.
+            max_delay (float, optional): maximum backoff in seconds. Defaults to 120.0.
+            reserve (int, optional): remaining primary points at which the calls pause until the reset. Defaults to 10.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reserve = reserve
+        self.points = {'graphql': TokenBucket(graphql_points_per_second, burst), 'rest': TokenBucket(rest_points_per_second, burst)}
+        self.creations = TokenBucket(creations_per_minute / 60, creations_per_minute / 4)
+        # GraphQL and REST ('core') have their own primary budget and reset time
+        self.remaining = {'graphql': None, 'rest': None}
+        self.reset_at = {'graphql': None, 'rest': None}
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'points': 0, 'throttled_seconds': 0.0, 'backoff_seconds': 0.0, 'statuses': {}, 'limit': {}, 'used': {}}
+
+    def acquire(self, cost, creations=0, api='graphql'):
+        """ waits until the token buckets and the primary budget of the API allow a call of 'cost' points
+
+        Args:
+            cost (int): points of the call
+            creations (int, optional): number of contents (ie. discussions) the call creates. Defaults to 0.
+            api (str, optional): 'graphql' or 'rest', the APIs have their own points budget. Defaults to 'graphql'.
+        """
+        with self.lock:
+            wait = max(self.points[api].take(cost), self.creations.take(creations))
+            remaining, reset_at = self.remaining[api], self.reset_at[api]
+            if remaining is not None and reset_at is not None and remaining - cost < self.reserve:
+                wait = max(wait, reset_at - time.time() + 1)
+                self.remaining[api] = None
+            self.counters['throttled_seconds'] += wait
+        if wait > 0:
+            if wait > 5:
+                print(f'Rate limit: waiting {wait:.0f} seconds')
+            time.sleep(wait)
+
+    def update(self, response, api='graphql'):
+        """ tracks the primary budget of the API from the response headers
+
+        Args:
+            response (requests.Response): the response
+            api (str, optional): 'graphql' or 'rest', the API of the call. Defaults to 'graphql'.
+        """
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters['statuses'][response.status_code] = self.counters['statuses'].get(response.status_code, 0) + 1
+            if 'X-RateLimit-Remaining' in response.headers:
+                self.remaining[api] = int(response.headers['X-RateLimit-Remaining'])
+                self.reset_at[api] = int(response.headers.get('X-RateLimit-Reset', time.time()))
+                self.counters['limit'][api] = int(response.headers.get('X-RateLimit-Limit', 0))
+                self.counters['used'][api] = int(response.headers.get('X-RateLimit-Used', 0))
+
+    def backoff(self, response, attempt, idempotent=True):
+        """ returns the time to wait before retrying a call
+
+        Args:
+            response (requests.Response): the response, None when the connection failed
+            attempt (int): number of the retry, starting at 0
+            idempotent (bool, optional): the call may be sent again when it is unknown whether it was applied. Defaults to True.
+
+        Returns:
+            float: seconds, None when the call should not be retried
+        """
+        if attempt >= self.max_retries:
+            return None
+        # GitHub rejects a call on a secondary rate limit before running it, after a bad gateway or a dropped connection it may have been applied
+        retry_statuses = (403, 429, 502) if idempotent else (403, 429)
+        if response is None and not idempotent:
+            return None
+        if response is not None and response.status_code not in retry_statuses:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if response is not None:
+            if 'Retry-After' in response.headers:
+                delay = max(delay, float(response.headers['Retry-After']))
+            elif response.headers.get('X-RateLimit-Remaining') == '0':
+                delay = max(delay, int(response.headers.get('X-RateLimit-Reset', time.time())) - time.time() + 1)
+            elif response.status_code == 403 and 'rate limit' not in response.text.lower():
+                # Forbidden for another reason than a secondary rate limit
+                return None
+        return delay
+
+    def request(self, send, cost=1, creations=0, idempotent=True, api='graphql'):
+        """ places a call within the rate limits, retrying it on rate limit errors (and on gateway and connection errors when it is idempotent)
+
+        Args:
+            send (function): places the call, returns a requests.Response
+            cost (int, optional): points of the call. Defaults to 1.
+            creations (int, optional): number of contents (ie. discussions) the call creates. Defaults to 0.
+            idempotent (bool, optional): the call can safely be sent twice, False for mutations. Defaults to True.
+            api (str, optional): 'graphql' or 'rest'. Defaults to 'graphql'.
+
+        Returns:
+            requests.Response: the response
+        """
+        attempt = 0
+        while True:
+            self.acquire(cost, creations, api)
+            try:
+                response = send()
+            except requests.ConnectionError:
+                response = None
+                delay = self.backoff(None, attempt, idempotent)
+                if delay is None:
+                    raise
+            else:
+                self.update(response, api)
+                delay = self.backoff(response, attempt, idempotent)
+                if delay is None:
+                    with self.lock:
+                        self.counters['points'] += cost
+                    return response
+            print(f'Retrying in {delay:.1f} seconds ({response.status_code if response is not None else "connection error"})')
+            with self.lock:
+                self.counters['retries'] += 1
+                self.counters['backoff_seconds'] += delay
+            time.sleep(delay)
+            attempt += 1
+
+    def metrics(self):
+        """ returns the counters of the scheduler
+
+        Returns:
+            dict: 'requests', 'retries', 'points' (as estimated upfront), 'throttled_seconds', 'backoff_seconds',
+            'statuses' (count per HTTP status) and the last known 'remaining', 'used' and 'limit' of the primary budget per API
+        """
+        with self.lock:
+            return {**self.counters, 'statuses': dict(self.counters['statuses']), 'limit': dict(self.counters['limit']), 'used': dict(self.counters['used']),
+                    'throttled_seconds': round(self.counters['throttled_seconds'], 1), 'backoff_seconds': round(self.counters['backoff_seconds'], 1),
+                    'remaining': dict(self.remaining)}
+
+
+class GitHubClient:
+    """ places the GitHub API calls over one pooled session (keep-alive connections are reused), through the rate limit scheduler
+    """
+    def __init__(self, token, graphql_url=GRAPHQL_URL, rest_url=REST_URL, scheduler=None, pool_size=CONCURRENCY, timeout=60):
+        """ opens the pooled session, authorized with the access token
+
+        Args:
+            token (str): the GitHub access token
+            graphql_url (str, optional): url of the GraphQL API, ie. of a local stub server. Defaults to GRAPHQL_URL.
+            rest_url (str, optional): base url of the REST API. Defaults to REST_URL.
+            scheduler (RateLimitScheduler, optional): the rate limit scheduler. Defaults to a new scheduler.
+            pool_size (int, optional): maximum number of pooled connections, at least the number of concurrent requests. Defaults to CONCURRENCY.
+            timeout (int, optional): timeout of a call in seconds. Defaults to 60.
+        """
+        self.graphql_url = graphql_url
+        self.rest_url = rest_url.rstrip('/')
+        self.scheduler = scheduler if scheduler is not None else RateLimitScheduler()
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Authorization'] = 'token ' + token
+
+    def graphql(self, query, variables=None):
+        """ places a GraphQL call
+
+        Args:
+            query (str): the query or mutation
+            variables (dict, optional): the variables of the query. Defaults to None.
+
+        Returns:
+            requests.Response: the response
+        """
+        payload = {'query': query}
+        if variables is not None:
+            payload['variables'] = variables
+        cost, creations = request_cost(payload)
+        return self.scheduler.request(
+            lambda: self.session.post(self.graphql_url, json=payload, timeout=self.timeout), cost, creations, idempotent=not is_mutation(payload))
+
+    def rest(self, path, params=None):
+        """ places a REST call
+
+        Args:
+            path (str): path of the resource, ie. '/repos/myorg/myorg.github.io/git/trees/<sha>'
+            params (dict, optional): query parameters. Defaults to None.
+
+        Returns:
+            requests.Response: the response
+        """
+        return self.scheduler.request(
+            lambda: self.session.get(self.rest_url + path, params=params, headers={'Accept': 'application/vnd.github+json'}, timeout=self.timeout), api='rest')
+
+    def close(self):
+        """ closes the pooled connections
+        """
+        self.session.close()
+
+
+def request_cost(payload):
+    """ estimates the cost of a GraphQL call for the secondary rate limits, a query counts as 1 point and a call with mutations as 5
+
+    Args:
+        payload (dict): the JSON payload with the 'query'
+
+    Returns:
+        tuple: (points, number of discussions the call creates)
+    """
+    query = str(payload.get('query', ''))
+    if is_mutation(payload):
+        return 5, query.count('createDiscussion(')
+    return 1, 0
+
+
+def is_mutation(payload):
+    """ checks whether a GraphQL call has mutations, which are not idempotent
+
+    Args:
+        payload (dict): the JSON payload with the 'query'
+
+    Returns:
+        bool: True for a mutation
+    """
+    return str(payload.get('query', '')).lstrip().startswith('mutation')
 
-        # place the call
-        response = requests.post(
-            'https://api.github.com/graphql', json={'query': query})
+
+def iter_discussions(client, owner, name, category_id, page_size=100):
+    """ yields the discussions of a category page by page, following the cursor until the last page
+
+    Args:
+        client (GitHubClient): the GitHub client
+        owner (str): owner of the discussion repository
+        name (str): name of the discussion repository
+        category_id (str): id of the discussion category
+        page_size (int, optional): discussions per request, at most 100. Defaults to 100.
+
+    Yields:
+        dict: discussion node ('id', 'number', 'title', 'closed' and 'updatedAt'), the most recently updated first
+    """
+    after = None
+    while True:
+        response = client.graphql(DISCUSSIONS_QUERY, {
+            'owner': owner, 'name': name, 'categoryId': category_id, 'first': page_size, 'after': after})
         data = response.json()
-        print(data)
+        if 'errors' in data:
+            logging.error(data['errors'])
+        discussions = data["data"]["repository"]["discussions"]
+        yield from discussions["nodes"]
+        if not discussions["pageInfo"]["hasNextPage"]:
+            return
+        after = discussions["pageInfo"]["endCursor"]
+
+
+def find_discussions(client, settings, titles, since=None):
+    """ looks up discussions by their title, ie. to find out whether a batch without a result created them anyway
+
+    Args:
+        client (GitHubClient): the GitHub client
+        settings (dict): the settings
+        titles (set): the titles
+        since (str, optional): the discussions are only looked up among those updated since then (ISO 8601). Defaults to None (all discussions).
+
+    Returns:
+        dict: title to the discussion node for the titles that were found
+    """
+    found: dict = {}
+    for discussion_item in iter_discussions(client, settings['repo_owner'], settings['discussion_repo_name'], settings['discussion_category_id']):
+        if since and discussion_item['updatedAt'] < since:
+            break
+        if discussion_item['title'] in titles:
+            found.setdefault(discussion_item['title'], discussion_item)
+            if len(found) == len(titles):
+                break
+    return found
+
+
+def discussion_body(title, site_url):
+    """ returns the body of the discussion of a blog post
+
+    Args:
+        title (str): title of the discussion, ie. 'blog/my-post/'
+        site_url (str): url of the blog site, ending with a slash
+
+    Returns:
+        str: markdown body
+    """
+    return "# " + title + "\n\nAsk me anything about this blog!\n\n" + site_url + title
+
+
+def mutation_batch(client, operations):
+    """ places a batch of discussion mutations with one request, as aliased mutations (d0, d1, ...)
+
+    Args:
+        client (GitHubClient): the GitHub client
+        operations (list): (key, mutation, input) tuples, ie. ('blog/my-post/', 'createDiscussion', {'title': ...})
+
+    Returns:
+        tuple: (dict of key to the resulting discussion, dict of key to the error for the aliases that failed (with the alias in the 'path' of the error),
+        dict of key to the error for the mutations without a result, which may or may not have been applied)
+    """
+    variables = {}
+    definitions = []
+    mutations = []
+    for number, (_, mutation, mutation_input) in enumerate(operations):
+        variables[f'input{number}'] = mutation_input
+        definitions.append(f'$input{number}: {MUTATION_INPUT_TYPES[mutation]}!')
+        mutations.append(f'd{number}: {mutation}(input: $input{number}) {{ discussion {{ id number url updatedAt }} }}')
+    query = 'mutation(' + ', '.join(definitions) + ') {\n' + '\n'.join(mutations) + '\n}'
+    try:
+        response = client.graphql(query, variables)
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        return {}, {}, {key: str(e) for key, _, _ in operations}
+
+    # Map the results and errors back to the keys by their alias, an error without a path is about the whole batch
+    errors = {}
+    for error in data.get('errors') or []:
+        alias = (error.get('path') or [None])[0]
+        errors.setdefault(alias, error.get('message', str(error)))
+    results = data.get('data') or {}
+    done, failed, unknown = {}, {}, {}
+    for number, (key, _, _) in enumerate(operations):
+        result = results.get(f'd{number}')
+        if result and result.get('discussion'):
+            done[key] = result['discussion']
+        elif f'd{number}' in errors:
+            failed[key] = errors[f'd{number}']
+        else:
+            unknown[key] = errors.get(None, f'no result (HTTP {response.status_code})')
+    return done, failed, unknown
+
+
+def run_mutations(client, operations, batch_size=MUTATION_BATCH_SIZE, concurrency=CONCURRENCY, retries=2, find_discussions=None):
+    """ places discussion mutations in batches of aliased mutations, retrying only the aliases that failed.
+    Creating a discussion is not idempotent: when a batch has no result, the discussions it would create are looked up by their title before they are created again
+
+    Args:
+        client (GitHubClient): the GitHub client
+        operations (list): (key, mutation, input) tuples, the keys should be unique
+        batch_size (int, optional): mutations per request. Defaults to MUTATION_BATCH_SIZE.
+        concurrency (int, optional): maximum number of requests in flight. Defaults to CONCURRENCY.
+        retries (int, optional): number of times the failed mutations are retried. Defaults to 2.
+        find_discussions (function, optional): returns the discussions (title to discussion) with the given titles.
+            Defaults to None (the discussions of a batch without a result are not created again).
+
+    Returns:
+        tuple: (dict of key to the resulting discussion, dict of key to the last error)
+    """
+    done, failed = {}, {}
+    pending = list(operations)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for attempt in range(retries + 1):
+            if attempt > 0 and pending:
+                print(f'Retrying {len(pending)} failed mutations (attempt {attempt} of {retries})')
+            failed, unknown = {}, {}
+            futures = [executor.submit(mutation_batch, client, pending[start:start + batch_size])
+                       for start in range(0, len(pending), batch_size)]
+            for future in futures:
+                batch_done, batch_failed, batch_unknown = future.result()
+                done.update(batch_done)
+                failed.update(batch_failed)
+                unknown.update(batch_unknown)
+            # Updating and closing a discussion again is harmless, creating one again is not
+            unknown_creations = {operation[2]['title']: operation[0] for operation in pending
+                                 if operation[0] in unknown and operation[1] == 'createDiscussion'}
+            if unknown_creations and find_discussions is not None:
+                for title, discussion in find_discussions(set(unknown_creations)).items():
+                    done[unknown_creations[title]] = discussion
+                    del unknown[unknown_creations[title]]
+            pending = [operation for operation in pending if operation[0] in failed or
+                       (operation[0] in unknown and (operation[1] != 'createDiscussion' or find_discussions is not None))]
+            failed.update(unknown)
+            if not pending:
+                break
+    return done, failed
+
+
+def reconcile(posts, previous_posts, discussions, close_orphaned=False):
+    """ compares the posts with the discussions and plans what to do, with hashed lookups only (linear in the number of posts and discussions):
+    * create: posts without a discussion
+    * retitle: discussions of renamed posts, a renamed post has the same blob oid as a post of the previous run that has no post anymore
+    * close: open discussions without a post (only with 'close_orphaned', otherwise they are reported as 'orphaned')
+    * unchanged: posts with a discussion
+
+    Args:
+        posts (dict): expected title to blob oid of the current posts
+        previous_posts (dict): expected title to blob oid of the posts of the previous run
+        discussions (dict): id to 'number', 'title' (and 'closed') of the discussions
+        close_orphaned (bool, optional): plan to close the discussions without a post. Defaults to False.
+
+    Returns:
+        dict: 'create' (titles), 'retitle' (dicts of 'id', 'number', 'from' and 'to'), 'close' and 'orphaned' (dicts of 'id', 'number' and 'title') and 'unchanged' (titles)
+    """
+    discussion_ids_by_title: dict = {}
+    for discussion_id, discussion in discussions.items():
+        discussion_ids_by_title.setdefault(discussion['title'], discussion_id)
+    orphans = {title: discussion_id for title, discussion_id in discussion_ids_by_title.items()
+               if title not in posts and not discussions[discussion_id].get('closed')}
+    # The orphans of renamed posts, by the blob oid of their post in the previous run
+    orphans_by_oid: dict = {}
+    for title in orphans:
+        if previous_posts.get(title):
+            orphans_by_oid.setdefault(previous_posts[title], title)
+
+    plan: dict = {'create': [], 'retitle': [], 'close': [], 'orphaned': [], 'unchanged': []}
+    for title, oid in posts.items():
+        if title in discussion_ids_by_title:
+            plan['unchanged'].append(title)
+        elif oid and oid in orphans_by_oid:
+            old_title = orphans_by_oid.pop(oid)
+            discussion_id = orphans.pop(old_title)
+            plan['retitle'].append({'id': discussion_id, 'number': discussions[discussion_id].get('number'), 'from': old_title, 'to': title})
+        else:
+            plan['create'].append(title)
+    for title, discussion_id in orphans.items():
+        plan['close' if close_orphaned else 'orphaned'].append({'id': discussion_id, 'number': discussions[discussion_id].get('number'), 'title': title})
+    return plan
+
+
+def failed_renames(plan, previous_posts, failed):
+    """ returns the previous titles of the renamed posts whose discussion could not be retitled,
+    they are kept in the local index so the next run still recognizes the renames (instead of creating a second discussion)
+
+    Args:
+        plan (dict): the plan, as returned by reconcile
+        previous_posts (dict): expected title to blob oid of the posts of the previous run
+        failed (dict): key (the new title for a retitle) to the error of the mutations that failed
+
+    Returns:
+        dict: previous title to blob oid
+    """
+    return {retitle['from']: previous_posts[retitle['from']] for retitle in plan['retitle']
+            if retitle['to'] in failed and retitle['from'] in previous_posts}
+
+
+def print_plan(plan):
+    """ prints the plan as a diff
+
+    Args:
+        plan (dict): the plan, as returned by reconcile
+    """
+    for title in plan['create']:
+        print('+ create  ', title)
+    for retitle in plan['retitle']:
+        print(f"~ retitle  #{retitle['number']} {retitle['from']} -> {retitle['to']}")
+    for orphan in plan['close']:
+        print(f"- close    #{orphan['number']} {orphan['title']}")
+    for orphan in plan['orphaned']:
+        print(f"! orphaned #{orphan['number']} {orphan['title']} (use '--close-orphaned' to close it)")
+    print(', '.join(f'{action}: {len(items)}' for action, items in plan.items()))
+
+
+def plan_operations(plan, repository_id, category_id, site_url):
+    """ transforms the plan to discussion mutations
+
+    Args:
+        plan (dict): the plan, as returned by reconcile
+        repository_id (str): id of the discussion repository
+        category_id (str): id of the discussion category
+        site_url (str): url of the blog site, part of the discussion body
+
+    Returns:
+        list: (key, mutation, input) tuples, the key is the title of the post (or of the orphaned discussion)
+    """
+    operations = [(title, 'createDiscussion', {
+        'repositoryId': repository_id, 'categoryId': category_id, 'title': title, 'body': discussion_body(title, site_url)})
+        for title in plan['create']]
+    operations += [(retitle['to'], 'updateDiscussion', {
+        'discussionId': retitle['id'], 'title': retitle['to'], 'body': discussion_body(retitle['to'], site_url)})
+        for retitle in plan['retitle']]
+    operations += [(orphan['title'], 'closeDiscussion', {'discussionId': orphan['id'], 'reason': 'OUTDATED'})
+                   for orphan in plan['close']]
+    return operations
+
+
+def post_title(file_name):
+    """ transforms the file name of a post to the title of its discussion, which corresponds to the site Url
+
+    Args:
+        file_name (str): file name of the post, ie. '2022-12-21-my-post.md'
+
+    Returns:
+        str: discussion title, ie. 'blog/my-post/'
+    """
+    # remove chars
+    name: str = re.sub(r".md$", '', str(file_name)[11:])
+    # add chars
+    return 'blog/' + name + '/'
+
+
+def iter_tree_blobs(client, owner, name, tree_sha, path=''):
+    """ yields the files of a git tree and its subtrees, with one recursive call to the git trees API.
+    When GitHub truncates the recursive tree (more than 100,000 entries or 7 MB), the subtrees are fetched one by one
+
+    Args:
+        client (GitHubClient): the GitHub client
+        owner (str): owner of the repository
+        name (str): name of the repository
+        tree_sha (str): sha of the tree
+        path (str, optional): path of the tree, prefixed to the paths of its files. Defaults to ''.
+
+    Yields:
+        dict: tree entry of a file ('path', relative to the first tree, and 'sha')
+    """
+    response = client.rest(f'/repos/{owner}/{name}/git/trees/{tree_sha}', {'recursive': '1'})
+    response.raise_for_status()
+    tree = response.json()
+    if tree.get('truncated'):
+        response = client.rest(f'/repos/{owner}/{name}/git/trees/{tree_sha}')
+        response.raise_for_status()
+        tree = response.json()
+        for entry in tree['tree']:
+            if entry['type'] == 'tree':
+                yield from iter_tree_blobs(client, owner, name, entry['sha'], path + entry['path'] + '/')
+            elif entry['type'] == 'blob':
+                yield {**entry, 'path': path + entry['path']}
+        return
+    for entry in tree['tree']:
+        if entry['type'] == 'blob':
+            yield {**entry, 'path': path + entry['path']}
+
+
+def parse_permalink(lines):
+    """ parses the 'permalink' from the frontmatter of a post, only reading up to the end of the frontmatter
+
+    Args:
+        lines (iterable): lines of the post, ie. an open file
+
+    Returns:
+        str: the permalink, None when the post has none
+    """
+    lines = iter(lines)
+    if next(lines, '').strip() != '---':
+        return None
+    for line in lines:
+        if line.strip() == '---':
+            break
+        match = PERMALINK_PATTERN.match(line.strip())
+        if match:
+            return match.group(1)
+    return None
+
+
+def read_permalink(post_path):
+    """ reads the 'permalink' from the frontmatter of a post file
+
+    Args:
+        post_path (str): path of the post
+
+    Returns:
+        str: the permalink, None when the post has none
+    """
+    with open(post_path, 'r', encoding='utf8', errors='replace') as post_file:
+        return parse_permalink(post_file)
+
+
+def discussion_title(file_name, permalink):
+    """ returns the title of the discussion of a post, the same for a local checkout and the git trees API
+
+    Args:
+        file_name (str): file name of the post, ie. '2022-12-21-my-post.md'
+        permalink (str): the 'permalink' in the frontmatter of the post, None when it has none
+
+    Returns:
+        str: discussion title, ie. 'blog/my-post/'
+    """
+    return permalink.lstrip('/') if permalink else post_title(file_name)
+
+
+def fetch_permalinks(client, owner, name, oids, batch_size=BLOB_BATCH_SIZE):
+    """ fetches the content of posts by their blob oid, as aliased object lookups (b0, b1, ...), and reads their 'permalink'
+
+    Args:
+        client (GitHubClient): the GitHub client
+        owner (str): owner of the blog repository
+        name (str): name of the blog repository
+        oids (list): blob oids of the posts
+        batch_size (int, optional): posts per request. Defaults to BLOB_BATCH_SIZE.
+
+    Returns:
+        dict: blob oid to the permalink, None when the post has none
+    """
+    permalinks: dict = {}
+    for start in range(0, len(oids), batch_size):
+        batch = oids[start:start + batch_size]
+        definitions = ''.join(f', $oid{number}: GitObjectID!' for number in range(len(batch)))
+        lookups = '\n'.join(f'b{number}: object(oid: $oid{number}) {{ ... on Blob {{ text }} }}' for number in range(len(batch)))
+        query = f'query($owner: String!, $name: String!{definitions}) {{\nrepository(owner: $owner, name: $name) {{\n{lookups}\n}}\n}}'
+        response = client.graphql(query, {'owner': owner, 'name': name, **{f'oid{number}': oid for number, oid in enumerate(batch)}})
+        data = response.json()
+        if 'errors' in data:
+            logging.error(data['errors'])
+        repository = data['data']['repository']
+        for number, oid in enumerate(batch):
+            text = (repository.get(f'b{number}') or {}).get('text')
+            permalinks[oid] = parse_permalink(text.splitlines()) if text else None
+    return permalinks
+
+
+def git_blob_oid(post_path, size):
+    """ computes the git blob oid of a file, the same oid GitHub returns for the file (with the same line endings)
+
+    Args:
+        post_path (str): path of the file
+        size (int): size of the file in bytes
+
+    Returns:
+        str: hex digest
+    """
+    blob_hash = hashlib.sha1(f'blob {size}\0'.encode('ascii'))
+    with open(post_path, 'rb') as post_file:
+        for chunk in iter(lambda: post_file.read(65536), b''):
+            blob_hash.update(chunk)
+    return blob_hash.hexdigest()
+
+
+def iter_local_posts(directory):
+    """ yields the markdown files in a directory and its subdirectories, streaming with os.scandir
+
+    Args:
+        directory (str): the posts directory of the local checkout
+
+    Yields:
+        os.DirEntry: a markdown file
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_local_posts(entry.path)
+            elif entry.is_file() and entry.name.endswith('.md'):
+                yield entry
+
+
+def scan_posts(directory):
+    """ enumerates the posts of a local checkout of the blog repository without any network call.
+    The title of the discussion is derived from the 'permalink' in the frontmatter of the post when present, otherwise from its file name
+
+    Args:
+        directory (str): the posts directory of the local checkout
+
+    Returns:
+        dict: discussion title (ie. 'blog/my-post/') to the blob oid of the post
+    """
+    posts: dict = {}
+    for entry in iter_local_posts(directory):
+        posts[discussion_title(entry.name, read_permalink(entry.path))] = git_blob_oid(entry.path, entry.stat().st_size)
+    return posts
+
+
+def fetch_posts(client, owner, name, tree_sha, permalinks=None):
+    """ fetches the posts of the blog repository, including those in subfolders, and transforms them to the discussion titles
+    (from the 'permalink' in their frontmatter, otherwise from their file name, like 'scan_posts').
+    The blob oid of every post is kept to recognize renamed posts
+
+    Args:
+        client (GitHubClient): the GitHub client
+        owner (str): owner of the blog repository
+        name (str): name of the blog repository
+        tree_sha (str): sha of the posts tree
+        permalinks (dict, optional): blob oid to the permalink of the posts of the previous run, only the other posts are fetched. Defaults to None.
+
+    Returns:
+        tuple: (dict of discussion title (ie. 'blog/my-post/') to the blob oid of the post, dict of blob oid to the permalink of the current posts)
+    """
+    entries = [entry for entry in iter_tree_blobs(client, owner, name, tree_sha) if entry['path'].endswith('.md')]
+    known_permalinks = permalinks or {}
+    current_permalinks = {entry['sha']: known_permalinks[entry['sha']] for entry in entries if entry['sha'] in known_permalinks}
+    current_permalinks.update(fetch_permalinks(
+        client, owner, name, list(dict.fromkeys(entry['sha'] for entry in entries if entry['sha'] not in current_permalinks))))
+    posts: dict = {}
+    for entry in entries:
+        posts[discussion_title(entry['path'].rsplit('/', 1)[-1], current_permalinks[entry['sha']])] = entry['sha']
+    return posts, current_permalinks
+
+
+def load_state(state_path):
+    """ loads the local index of the previous run
+
+    Args:
+        state_path (str): path of the JSON state file
+
+    Returns:
+        dict: 'posts_oid' (oid of the '_posts' tree), 'posts' (expected title to blob oid), 'discussions' (id to 'number', 'title', 'closed' and 'updatedAt'),
+        'discussion_count', 'discussions_updated_at' (the last update of any discussion), 'pending_renames' (previous title to blob oid of the posts
+        whose discussion could not be retitled) and 'permalinks' (blob oid to the permalink of the posts), empty when there is no (valid) state file
+    """
+    try:
+        with open(state_path, 'r', encoding='utf8') as state_file:
+            state = json.load(state_file)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logging.warning(f'Ignoring the invalid state file {state_path}')
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_state(state_path, state):
+    """ saves the local index atomically (temporary file + rename)
+
+    Args:
+        state_path (str): path of the JSON state file
+        state (dict): the local index
+    """
+    state_dir = os.path.dirname(os.path.abspath(state_path))
+    with tempfile.NamedTemporaryFile('w', encoding='utf8', dir=state_dir, suffix='.tmp', delete=False) as temp_file:
+        json.dump(state, temp_file)
+    os.replace(temp_file.name, state_path)
+
+
+def fetch_discussions(client, settings, state):
+    """ fetches the discussions that changed since the last run and merges them with the local index,
+    falls back to fetching all discussions when discussions were deleted (or there is no index)
+
+    Args:
+        client (GitHubClient): the GitHub client
+        settings (dict): the settings
+        state (dict): the local index, its 'discussions' are updated
+
+    Returns:
+        dict: id to 'number', 'title', 'closed' and 'updatedAt' of all discussions
+    """
+    known_updated_at = state.get('discussions_updated_at') if 'discussions' in state else None
+    discussions = dict(state.get('discussions', {})) if known_updated_at else {}
+    for discussion_item in iter_discussions(client, settings['repo_owner'], settings['discussion_repo_name'], settings['discussion_category_id']):
+        # The discussions are ordered by their last update, the rest did not change since the last run
+        if known_updated_at and discussion_item['updatedAt'] < known_updated_at:
+            break
+        discussions[discussion_item['id']] = {key: discussion_item.get(key) for key in ('number', 'title', 'closed', 'updatedAt')}
+    if known_updated_at and len(discussions) != state.get('discussion_count'):
+        # Discussions were deleted, which does not show in the last update
+        print('The local index of the discussions is outdated, fetching all discussions')
+        return fetch_discussions(client, settings, {})
+    return discussions
+
+
+def sync_index(client, settings, state):
+    """ brings the local index up to date: one call finds out what changed since the last run and only that is fetched
+
+    Args:
+        client (GitHubClient): the GitHub client
+        settings (dict): the settings
+        state (dict): the local index of the previous run (empty to fetch everything), updated in place
+
+    Returns:
+        tuple: (dict of the expected titles of the posts to their blob oid, dict of id to the discussion)
+    """
+    # With a local checkout only the discussions are asked for
+    local_checkout = settings.get('local_checkout')
+    response = client.graphql(CHANGES_QUERY, {
+        'owner': settings['repo_owner'], 'blogName': settings['blog_repo_name'],
+        'postsExpression': settings['blog_branch'] + ':' + settings['posts_dir'].strip('/'), 'withPosts': not local_checkout,
+        'discussionName': settings['discussion_repo_name'], 'categoryId': settings['discussion_category_id']})
+    data = response.json()["data"]
+    posts_oid = data["blog"]["object"]["oid"] if not local_checkout else None
+    discussion_count = data["comments"]["discussions"]["totalCount"]
+    latest_nodes = data["comments"]["discussions"]["nodes"]
+    discussions_updated_at = latest_nodes[0]["updatedAt"] if latest_nodes else None
+
+    # The posts are cached by the sha of their tree, which changes with any change to a post (or a subfolder)
+    # An index without permalinks has the titles of the file names
+    posts_changed = state.get('posts_oid') != posts_oid or 'posts' not in state or 'permalinks' not in state or bool(local_checkout)
+    discussions_changed = state.get('discussion_count') != discussion_count \
+        or state.get('discussions_updated_at') != discussions_updated_at or 'discussions' not in state
+    print(f"Posts changed: {posts_changed}, discussions changed: {discussions_changed}")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if local_checkout:
+            posts_future = executor.submit(scan_posts, os.path.join(local_checkout, settings['posts_dir']))
+        elif posts_changed:
+            posts_future = executor.submit(
+                fetch_posts, client, settings['repo_owner'], settings['blog_repo_name'], posts_oid, state.get('permalinks'))
+        else:
+            posts_future = None
+        state['discussion_count'] = discussion_count
+        discussions = fetch_discussions(client, settings, state) if discussions_changed else state['discussions']
+        if posts_future is None:
+            posts = state['posts']
+        elif local_checkout:
+            posts = posts_future.result()
+        else:
+            posts, state['permalinks'] = posts_future.result()
+    state.update({
+        'posts_oid': posts_oid,
+        'posts': posts,
+        'discussions': discussions,
+        'discussions_updated_at': discussions_updated_at})
+    return posts, discussions
+
+
+def load_settings():
+    """ loads the access token and the other variables from the CLI password tool
+
+    Returns:
+        dict: 'github_token' and the variables of the password tool entry
+    """
+    settings = {
+        'github_token': '',
+        'repo_owner': '',
+        'blog_repo_name': '',
+        'discussion_repo_name': '',
+        'discussion_repo_id': '',
+        'discussion_category_id': '',
+        'blogsite_url': '',
+        'blog_branch': 'HEAD',
+        'posts_dir': '_posts',
+        'local_checkout': None}
+    # The below routine is valid when using my CLI password manager. Adjust accordingly
+    p1 = subprocess.Popen(
+        ["pass", "github/github-pages-auto-discussion"], stdout=subprocess.PIPE)
+    i = 0
+    for pass_line in (str(p1.communicate())[3:-10]).split('\\n'):
+        #print("line", i, pass_line)
+        if i == 0:
+            settings['github_token'] = pass_line
+        else:
+            var_key = pass_line.split('=')[0]
+            var_value = pass_line.split('=')[1]
+            settings[var_key] = var_value
+        i = i + 1
+    return settings
+
+
+def main(argv):
+    """ adds a discussion for every blog post that does not have one
+
+    Args:
+        argv (list): CLI arguments
+    """
+    # Init Variables
+    mutation_batch_size: int = MUTATION_BATCH_SIZE
+    concurrency: int = CONCURRENCY
+    state_path: str = STATE_FILE_NAME
+    full_sync: bool = False
+    dry_run: bool = False
+    close_orphaned: bool = False
+    blog_branch: str | None = None
+    posts_dir: str | None = None
+    local_checkout: str | None = None
+    help_message: str = 'auto_discussion_for_jekyl_blog_post.py [-b <mutations_per_request>] [-c <concurrent_requests>] [-s <state_file>] [-f] [-n] [--close-orphaned]' + \
+        ' [-r <blog_branch>] [-p <posts_dir>] [-l <blog_checkout_dir>]'
+
+    # Processing CLI input
+    try:
+        opts, args = getopt.getopt(argv, "hb:c:s:fnr:p:l:", [
+            "help", "batch-size=", "concurrency=", "state=", "full", "dry-run", "close-orphaned", "branch=", "posts-dir=", "local="])
+    except getopt.GetoptError:
+        print(help_message)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print(help_message)
+            sys.exit()
+        elif opt in ("-b", "--batch-size"):
+            try:
+                mutation_batch_size = max(1, int(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-c", "--concurrency"):
+            try:
+                concurrency = max(1, int(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt in ("-s", "--state"):
+            state_path = str(arg)
+        elif opt in ("-f", "--full"):
+            full_sync = True
+        elif opt in ("-n", "--dry-run"):
+            dry_run = True
+        elif opt == "--close-orphaned":
+            close_orphaned = True
+        elif opt in ("-r", "--branch"):
+            blog_branch = str(arg)
+        elif opt in ("-p", "--posts-dir"):
+            posts_dir = str(arg)
+        elif opt in ("-l", "--local"):
+            local_checkout = str(arg)
+
+    settings = load_settings()
+    if blog_branch is not None:
+        settings['blog_branch'] = blog_branch
+    if posts_dir is not None:
+        settings['posts_dir'] = posts_dir
+    if local_checkout is not None:
+        if not os.path.isdir(os.path.join(local_checkout, settings['posts_dir'])):
+            print(f"The local checkout has no '{settings['posts_dir']}' folder. Exiting...")
+            sys.exit(2)
+        settings['local_checkout'] = local_checkout
+    client = GitHubClient(settings['github_token'], pool_size=max(2, concurrency))
+    try:
+        # Only fetch the blog posts and discussions that changed since the last run
+        state = {} if full_sync else load_state(state_path)
+        # Including the renamed posts of which the discussion could not be retitled in a previous run
+        previous_posts = {**state.get('pending_renames', {}), **state.get('posts', {})}
+        try:
+            posts, discussions = sync_index(client, settings, state)
+        except (KeyError, TypeError) as e:
+            logging.error(f"{e}\nThe data has no items")
+            sys.exit(2)
+        print('Number of posts: ', len(posts))
+        print('Number of discussions: ', len(discussions))
+
+        # Plan and apply the discussions to create, retitle and close
+        plan = reconcile(posts, previous_posts, discussions, close_orphaned)
+        print_plan(plan)
+        if dry_run:
+            # The index is not saved, so the next run still recognizes the renamed posts
+            return
+        # A discussion created before this run has been updated before the last known update
+        since = state.get('discussions_updated_at')
+        done, failed = run_mutations(
+            client, plan_operations(plan, settings['discussion_repo_id'], settings['discussion_category_id'], settings['blogsite_url']),
+            mutation_batch_size, concurrency, find_discussions=lambda titles: find_discussions(client, settings, titles, since))
+        closed_ids = {orphan['id'] for orphan in plan['close']}
+        for title, discussion in done.items():
+            print('Done for blog:', title, discussion.get('url', ''))
+            discussions[discussion['id']] = {
+                'number': discussion.get('number'), 'title': title, 'closed': discussion['id'] in closed_ids, 'updatedAt': discussion.get('updatedAt')}
+        for title, error in failed.items():
+            logging.error(f"Reconciling the discussion of blog {title} failed: {error}")
+        print(f'Discussions reconciled: {len(done)}, failed: {len(failed)}')
+        state['pending_renames'] = failed_renames(plan, previous_posts, failed)
+        if done:
+            # The changed discussions are the most recently updated, so the next run does not need to fetch them
+            state['discussion_count'] += len(set(done) & set(plan['create']))
+            state['discussions_updated_at'] = max(
+                [state['discussions_updated_at'] or ''] + [discussion['updatedAt'] for discussion in done.values() if discussion.get('updatedAt')])
+        save_state(state_path, state)
+        print('Rate limit metrics:', client.scheduler.metrics())
+    finally:
+        client.close()
+    if failed:
+        sys.exit(1)
+
+
+# Start main thread
+if __name__ == "__main__":
+    main(sys.argv[1:])
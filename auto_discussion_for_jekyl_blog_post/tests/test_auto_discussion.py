@@ -0,0 +1,362 @@
+"""
+Tests of 'auto_discussion_for_jekyl_blog_post.py' against a local stand-in of the GitHub GraphQL API.
+
+The stub server keeps its discussions in memory and counts the requests, so the tests check both the results and the number of calls.
+
+Example:
+python -m unittest discover -s tests
+"""
+
+# Import modules
+import os
+import sys
+import re
+import json
+import tempfile
+import time
+import threading
+import unittest
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import auto_discussion_for_jekyl_blog_post as auto_discussion
+except ImportError as error:
+    raise unittest.SkipTest(f'needs the dependencies of the script: {error}')
+
+
+# Define classes
+class StubGitHubHandler(BaseHTTPRequestHandler):
+    """ answers the GraphQL calls (and the git trees calls) of the script from the discussions (and the posts) of the server
+    """
+    protocol_version = 'HTTP/1.1'
+    # The client keeps the connection alive, do not delay the body after the headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """ answers a git trees call with the posts of the server, as one recursive tree
+        """
+        with self.server.lock:
+            self.server.requests.append({'path': self.path})
+        self.send_body(200, {'sha': 'tree', 'tree': [{'path': path, 'type': 'blob', 'sha': oid} for path, oid in self.server.tree.items()], 'truncated': False},
+                       'core')
+
+    def do_POST(self):
+        """ answers a GraphQL call
+        """
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests.append(payload)
+            code, response = self.server.answer(payload)
+        self.send_body(code, response, 'graphql')
+
+    def send_body(self, code, response, resource):
+        """ sends a JSON response, with the primary rate limit headers of the resource when the server has them
+
+        Args:
+            code (int): HTTP status code
+            response (dict): the response body
+            resource (str): the rate limit resource of the call, 'core' (REST) or 'graphql'
+        """
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if resource in self.server.rate_limits:
+            remaining, reset_at = self.server.rate_limits[resource]
+            self.send_header('X-RateLimit-Resource', resource)
+            self.send_header('X-RateLimit-Remaining', str(remaining))
+            self.send_header('X-RateLimit-Reset', str(reset_at))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """ keeps the test output clean
+        """
+
+
+class StubGitHub(ThreadingHTTPServer):
+    """ local stand-in of the GitHub GraphQL API, serving the discussions of one category
+    """
+    def __init__(self, discussions):
+        """ starts the server on a free port of the loopback interface
+
+        Args:
+            discussions (list): discussion nodes ('id', 'number', 'title', 'closed' and 'updatedAt')
+        """
+        super().__init__(('127.0.0.1', 0), StubGitHubHandler)
+        self.discussions = discussions
+        # Path to blob oid of the posts and blob oid to content
+        self.tree = {}
+        self.blobs = {}
+        # Faults of the next mutation calls: 'applied_502' (applied, but answered with a bad gateway), 'alias_error' (the first alias fails)
+        # or 'secondary_limit' (rejected with a 403 before anything is applied), and of the next queries: '502'
+        self.mutation_faults = []
+        self.query_faults = []
+        # Resource ('core' or 'graphql') to the remaining points and the reset time sent in the rate limit headers
+        self.rate_limits = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return 'http://%s:%s/graphql' % self.server_address[:2]
+
+    @property
+    def rest_url(self):
+        return 'http://%s:%s' % self.server_address[:2]
+
+    def titles(self):
+        return [discussion['title'] for discussion in self.discussions]
+
+    def mutate(self, query, variables):
+        """ applies the aliased discussion mutations of a call
+
+        Args:
+            query (str): the mutation
+            variables (dict): the inputs
+
+        Returns:
+            tuple: HTTP status code and the response body
+        """
+        fault = self.mutation_faults.pop(0) if self.mutation_faults else None
+        if fault == 'secondary_limit':
+            return 403, {'message': 'You have exceeded a secondary rate limit. Please wait a few minutes before you try again.'}
+        data, errors = {}, []
+        for alias, mutation, number in re.findall(r'(\w+): (\w+)\(input: \$input(\d+)\)', query):
+            mutation_input = variables[f'input{number}']
+            if fault == 'alias_error' and not errors:
+                data[alias] = None
+                errors.append({'path': [alias], 'message': 'was submitted too quickly'})
+                continue
+            updated_at = f'2024-01-01T00:00:{len(self.requests) % 60:02d}Z'
+            if mutation == 'createDiscussion':
+                number = len(self.discussions) + 1
+                discussion = {'id': f'D{number}', 'number': number, 'title': mutation_input['title'], 'closed': False}
+                self.discussions.append(discussion)
+            else:
+                discussion = next(discussion for discussion in self.discussions if discussion['id'] == mutation_input['discussionId'])
+                if mutation == 'updateDiscussion':
+                    discussion['title'] = mutation_input['title']
+                else:
+                    discussion['closed'] = True
+            discussion['updatedAt'] = updated_at
+            data[alias] = {'discussion': {'id': discussion['id'], 'number': discussion['number'], 'url': '', 'updatedAt': updated_at}}
+        if fault == 'applied_502':
+            return 502, {'message': 'Bad Gateway'}
+        return 200, {'data': data, **({'errors': errors} if errors else {})}
+
+    def answer(self, payload):
+        """ answers a GraphQL call
+
+        Args:
+            payload (dict): the 'query' and its 'variables'
+
+        Returns:
+            tuple: HTTP status code and the response body
+        """
+        variables = payload.get('variables') or {}
+        if payload['query'].startswith('mutation'):
+            return self.mutate(payload['query'], variables)
+        if self.query_faults:
+            return int(self.query_faults.pop(0)), {'message': 'Bad Gateway'}
+        if '... on Blob' in payload['query']:
+            aliases = re.findall(r'(\w+): object\(oid: \$(\w+)\)', payload['query'])
+            return 200, {'data': {'repository': {alias: {'text': self.blobs[variables[variable]]} for alias, variable in aliases}}}
+        if 'discussions(first: $first' in payload['query']:
+            discussions = sorted(self.discussions, key=lambda discussion: discussion['updatedAt'], reverse=True)
+            start = int(variables.get('after') or 0)
+            end = start + variables['first']
+            return 200, {'data': {'repository': {'discussions': {
+                'pageInfo': {'hasNextPage': end < len(discussions), 'endCursor': str(end)},
+                'nodes': discussions[start:end]}}}}
+        return 200, {'errors': [{'message': 'The stub does not know this call'}]}
+
+
+class IterDiscussionsTest(unittest.TestCase):
+    """ all discussions are fetched by following the cursor, in pages of 100 """
+
+    def setUp(self):
+        self.server = StubGitHub([{'id': f'D{number}', 'number': number, 'title': f'blog/post-{number}/', 'closed': False,
+                                   'updatedAt': f'2023-01-01T00:00:{number % 60:02d}Z'} for number in range(10000)])
+        self.client = auto_discussion.GitHubClient('token', graphql_url=self.server.url)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.client.close)
+
+    def test_10k_discussions(self):
+        titles = [discussion['title'] for discussion in auto_discussion.iter_discussions(self.client, 'myorg', 'comments', 'DIC_1')]
+        self.assertEqual(len(self.server.requests), 100)
+        self.assertEqual(len(titles), 10000)
+        self.assertEqual(set(titles), {f'blog/post-{number}/' for number in range(10000)})
+        self.assertEqual([payload['variables']['after'] for payload in self.server.requests[:3]], [None, '100', '200'])
+
+
+class RunMutationsTest(unittest.TestCase):
+    """ only the aliases that failed are retried, discussions are never created twice """
+
+    def setUp(self):
+        self.server = StubGitHub([])
+        # Without retries in the scheduler, the bad gateways reach the batches
+        self.client = auto_discussion.GitHubClient('token', graphql_url=self.server.url,
+                                                   scheduler=auto_discussion.RateLimitScheduler(creations_per_minute=6000, max_retries=0))
+        self.settings = {'repo_owner': 'myorg', 'discussion_repo_name': 'comments', 'discussion_category_id': 'DIC_1'}
+        self.operations = [(f'blog/post-{number}/', 'createDiscussion', {'repositoryId': 'R_1', 'categoryId': 'DIC_1', 'title': f'blog/post-{number}/', 'body': ''})
+                           for number in range(30)]
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.client.close)
+
+    def run_mutations(self, find=True):
+        find_discussions = (lambda titles: auto_discussion.find_discussions(self.client, self.settings, titles)) if find else None
+        return auto_discussion.run_mutations(self.client, self.operations, batch_size=25, concurrency=1, find_discussions=find_discussions)
+
+    def test_alias_error_is_retried(self):
+        self.server.mutation_faults = ['alias_error']
+        done, failed = self.run_mutations()
+        self.assertEqual((len(done), failed), (30, {}))
+        self.assertEqual(sorted(self.server.titles()), sorted(key for key, _, _ in self.operations))
+
+    def test_applied_batch_without_result_is_not_created_again(self):
+        self.server.mutation_faults = ['applied_502']
+        done, failed = self.run_mutations()
+        self.assertEqual((len(done), failed), (30, {}))
+        self.assertEqual(sorted(self.server.titles()), sorted(key for key, _, _ in self.operations))
+
+    def test_batch_without_result_is_not_retried_blindly(self):
+        self.server.mutation_faults = ['applied_502']
+        done, failed = self.run_mutations(find=False)
+        self.assertEqual((len(done), len(failed)), (5, 25))
+        self.assertEqual(len(self.server.titles()), 30)
+
+
+class RateLimitSchedulerTest(unittest.TestCase):
+    """ queries are retried on bad gateways, mutations only on secondary rate limits """
+
+    def setUp(self):
+        self.server = StubGitHub([])
+        self.client = auto_discussion.GitHubClient('token', graphql_url=self.server.url,
+                                                   scheduler=auto_discussion.RateLimitScheduler(base_delay=0.01))
+        self.operations = [('blog/post/', 'createDiscussion', {'repositoryId': 'R_1', 'categoryId': 'DIC_1', 'title': 'blog/post/', 'body': ''})]
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.client.close)
+
+    def test_query_is_retried_on_bad_gateway(self):
+        self.server.query_faults = ['502', '502']
+        self.assertEqual(list(auto_discussion.iter_discussions(self.client, 'myorg', 'comments', 'DIC_1')), [])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_mutation_is_not_retried_on_bad_gateway(self):
+        self.server.mutation_faults = ['applied_502']
+        done, failed, unknown = auto_discussion.mutation_batch(self.client, self.operations)
+        self.assertEqual((done, failed, list(unknown)), ({}, {}, ['blog/post/']))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.titles(), ['blog/post/'])
+
+    def test_mutation_is_retried_on_secondary_limit(self):
+        self.server.mutation_faults = ['secondary_limit']
+        done, _, _ = auto_discussion.mutation_batch(self.client, self.operations)
+        self.assertEqual(list(done), ['blog/post/'])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.titles(), ['blog/post/'])
+
+
+class RateLimitBudgetTest(unittest.TestCase):
+    """ the primary budgets of the REST and the GraphQL API are tracked apart """
+
+    def setUp(self):
+        self.server = StubGitHub([])
+        self.client = auto_discussion.GitHubClient('token', graphql_url=self.server.url, rest_url=self.server.rest_url,
+                                                   scheduler=auto_discussion.RateLimitScheduler(reserve=10))
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.client.close)
+        self.reset_at = int(time.time()) + 3600
+        # Records the waits of the scheduler instead of sleeping until the reset
+        self.sleep = mock.patch.object(auto_discussion.time, 'sleep').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def waits(self, api):
+        """ returns the seconds the scheduler waits before the next call of an API """
+        self.sleep.reset_mock()
+        self.client.scheduler.acquire(1, api=api)
+        return sum(call.args[0] for call in self.sleep.call_args_list)
+
+    def test_exhausted_rest_budget_does_not_pause_graphql(self):
+        self.server.rate_limits = {'core': (3, self.reset_at), 'graphql': (4000, self.reset_at)}
+        self.client.rest('/repos/me/blog/git/trees/main')
+        list(auto_discussion.iter_discussions(self.client, 'myorg', 'comments', 'DIC_1'))
+        self.assertEqual(self.client.scheduler.metrics()['remaining'], {'graphql': 4000, 'rest': 3})
+        self.assertEqual(self.waits('graphql'), 0)
+        self.assertGreater(self.waits('rest'), 3000)
+
+    def test_exhausted_graphql_budget_does_not_pause_rest(self):
+        self.server.rate_limits = {'core': (4000, self.reset_at), 'graphql': (3, self.reset_at)}
+        list(auto_discussion.iter_discussions(self.client, 'myorg', 'comments', 'DIC_1'))
+        self.client.rest('/repos/me/blog/git/trees/main')
+        self.assertEqual(self.client.scheduler.metrics()['remaining'], {'graphql': 3, 'rest': 4000})
+        self.assertEqual(self.waits('rest'), 0)
+        self.assertGreater(self.waits('graphql'), 3000)
+
+
+class ReconcileTest(unittest.TestCase):
+    """ a renamed post is retitled, also in the run after a retitle failed """
+
+    def test_failed_retitle_is_planned_again(self):
+        previous_posts = {'blog/old/': 'oid-1'}
+        posts = {'blog/new/': 'oid-1'}
+        discussions = {'D1': {'number': 1, 'title': 'blog/old/', 'closed': False}}
+        plan = auto_discussion.reconcile(posts, previous_posts, discussions)
+        self.assertEqual([(retitle['from'], retitle['to']) for retitle in plan['retitle']], [('blog/old/', 'blog/new/')])
+        # The retitle failed, the next run has the current posts and the pending renames as its previous posts
+        pending_renames = auto_discussion.failed_renames(plan, previous_posts, {'blog/new/': 'was submitted too quickly'})
+        self.assertEqual(pending_renames, {'blog/old/': 'oid-1'})
+        plan = auto_discussion.reconcile(posts, {**pending_renames, **posts}, discussions)
+        self.assertEqual((plan['create'], len(plan['retitle'])), ([], 1))
+
+
+class PostTitlesTest(unittest.TestCase):
+    """ the posts get the same discussion titles from a local checkout and from the git trees API """
+
+    POSTS = {
+        '2023-01-01-plain.md': '---\ntitle: Plain\n---\nText\n',
+        '2023-01-02-custom.md': '---\ntitle: Custom\npermalink: /blog/custom/\n---\nText\n',
+        'sub/2023-01-03-nested.md': '---\npermalink: "/:categories/:title/"\n---\npermalink: /blog/not-frontmatter/\n'}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.server = StubGitHub([])
+        for path, text in self.POSTS.items():
+            post_path = os.path.join(self.directory.name, path)
+            os.makedirs(os.path.dirname(post_path), exist_ok=True)
+            with open(post_path, 'w', encoding='utf8', newline='\n') as post_file:
+                post_file.write(text)
+            oid = auto_discussion.git_blob_oid(post_path, os.path.getsize(post_path))
+            self.server.tree[path] = oid
+            self.server.blobs[oid] = text
+        self.client = auto_discussion.GitHubClient('token', graphql_url=self.server.url, rest_url=self.server.rest_url)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.client.close)
+
+    def test_same_titles(self):
+        local_posts = auto_discussion.scan_posts(self.directory.name)
+        self.assertEqual(set(local_posts), {'blog/plain/', 'blog/custom/', 'blog/nested/'})
+        posts, permalinks = auto_discussion.fetch_posts(self.client, 'myorg', 'myorg.github.io', 'tree')
+        self.assertEqual(posts, local_posts)
+        # One git trees call and one call for the content of the three posts
+        self.assertEqual(len(self.server.requests), 2)
+
+        # The permalinks of the previous run are not fetched again
+        self.server.requests.clear()
+        self.assertEqual(auto_discussion.fetch_posts(self.client, 'myorg', 'myorg.github.io', 'tree', permalinks), (posts, permalinks))
+        self.assertEqual(len(self.server.requests), 1)
+
+
+# Start main thread
+if __name__ == "__main__":
+    unittest.main()
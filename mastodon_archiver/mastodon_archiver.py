@@ -23,12 +23,32 @@ generating a html report (html) and show statistics (report).
 Further external enhancements (not included here!) include compressing and encrypting the data
 to a single archive and save the contents to a git repo or (cloud) storage.
 
+Every account runs its own pipeline (archive, media, expire, html and report) as an independent job on a pool of 'workers' (see 'mastodon.json').
+Accounts on the same instance share a limit of 'per_instance' phases talking to that instance at the same time, so one server's rate limits are not tripped.
+The output of every account is written to its own log file in 'log_dir', a summary per account is shown at the end.
+When a phase fails, the remaining phases of that account are skipped (so nothing is expired without a fresh archive) and the exit status is 1.
+The three media collections (statuses, favourites and bookmarks) of an account are downloaded one after another, as they write into the same media folder.
+The downloaded media are deduplicated into the content-addressed 'media_store' (files named by their sha256, hardlinked into the media folders),
+so an attachment in several collections or accounts is stored once. The store also indexes the media by their url ('<media_store>/urls/<host>/<path>'),
+before the download the media folder of an account is seeded with hardlinks to the media of its archive that another account (or an earlier run) already downloaded,
+so mastodon-archive does not download them again. Set 'media_store' to null to keep the media as downloaded.
+The megabytes downloaded, the throughput, the files seeded from the store and the megabytes saved are shown per account.
+Every completed phase is recorded in the checkpoint 'journal' (JSON lines, per account and per mode: dry-run or confirm), together with the last status id in the archive.
+When a run dies, the next run in the same mode resumes every account at the phase that did not complete. Once the pipeline of an account completes, its next run starts from 'archive' again.
+Use '--restart' to run every phase, it records a 'restart' of the accounts in the journal for the mode of the run (the unfinished runs of the other mode are kept).
+The jobs run mastodon-archive without a terminal, so they can not answer its authorization prompt. Accounts without secret files ('<instance>.client.secret' and
+'<instance>.user.<name>.secret') are authorized first, one at a time on the terminal (this runs 'mastodon-archive archive <user>').
+Without a terminal (ie. cron) such an account is skipped and reported as failed, authorize it once by running 'mastodon-archive archive <user>' interactively.
+
 Prerequisites:
 * Python3 3.9+
 * pip install mastodon-archive
 
 References:
 * https://github.com/kensanata/mastodon-archive
+* https://docs.python.org/3/library/concurrent.futures.html#threadpoolexecutor
+* https://en.wikipedia.org/wiki/Content-addressable_storage
+* https://jsonlines.org/
 
 Image Sources:
 None
@@ -48,6 +68,10 @@ mastodon_archiver.py
 This will start the 'Dry-Run' process of archiving the mastodon accounts specified in the 'mastodon.json' file.
 mastodon_archiver.py --confirm
 This will start the 'Real Destructive' process of archiving the mastodon accounts specified in the 'mastodon.json' file.
+mastodon_archiver.py -w 12
+This will run the pipelines of up to 12 accounts at the same time (overriding 'workers' in the 'mastodon.json' file).
+mastodon_archiver.py --restart
+This will start the 'Dry-Run' process from the first phase for every account, ignoring the phases completed by a previous run that did not finish.
 """
 
 
@@ -57,34 +81,522 @@ import sys
 import os
 import getopt
 import json
+import time
+import hashlib
+import shutil
+import threading
+import subprocess
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# Define constants
+DEFAULT_WORKERS = 4
+DEFAULT_PER_INSTANCE = 2
+DEFAULT_LOG_DIR = 'logs'
+DEFAULT_MEDIA_STORE = 'media_store'
+DEFAULT_JOURNAL = 'mastodon_archiver_journal.jsonl'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# Define classes
+class CheckpointJournal:
+    """ append-only journal (JSON lines) of the completed phases per account and mode
+
+    A 'finished' entry closes the run of an account, a 'restart' entry discards its completed phases.
+    """
+    def __init__(self, file_name):
+        """ loads the journal and compacts it to the completed phases of the unfinished runs
+
+        Args:
+            file_name (str): the journal file
+        """
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.open_entries = {}
+        if os.path.exists(file_name):
+            with open(file_name, 'r', encoding='utf8') as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A run that died while writing leaves a partial last line
+                        continue
+                    self.apply(entry)
+        # Compact: only the phases of unfinished runs are kept
+        temp_file_name = file_name + '.tmp'
+        with open(temp_file_name, 'w', encoding='utf8') as journal_file:
+            for entries in self.open_entries.values():
+                for entry in entries:
+                    journal_file.write(json.dumps(entry) + '\n')
+        os.replace(temp_file_name, file_name)
+
+    def completed(self, user, mode):
+        """ returns the phases an unfinished run of an account completed
+
+        Args:
+            user (str): the account
+            mode (str): 'dry-run' or 'confirm'
+
+        Returns:
+            dict: phase to its journal entry
+        """
+        return {entry['phase']: entry for entry in self.open_entries.get((user, mode), [])}
+
+    def apply(self, entry):
+        """ keeps track of the completed phases of the unfinished runs
+
+        Args:
+            entry (dict): a journal entry
+        """
+        key = (entry['user'], entry['mode'])
+        if entry['phase'] in ('finished', 'restart'):
+            self.open_entries.pop(key, None)
+        else:
+            self.open_entries.setdefault(key, []).append(entry)
+
+    def record(self, user, mode, phase, **details):
+        """ appends an entry to the journal, flushed to disk before returning
+
+        Args:
+            user (str): the account
+            mode (str): 'dry-run' or 'confirm'
+            phase (str): the completed phase, 'finished' when the pipeline of the account completed or 'restart' to discard its completed phases
+            **details: extra fields, ie. 'last_status_id'
+        """
+        entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'user': user, 'mode': mode, 'phase': phase, **details}
+        with self.lock:
+            self.apply(entry)
+            with open(self.file_name, 'a', encoding='utf8') as journal_file:
+                journal_file.write(json.dumps(entry) + '\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
 
 
 # Define functions
+def account_instance(user):
+    """ returns the instance of an account
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+
+    Returns:
+        str: the instance, ie. 'mastodon.social'
+    """
+    return user.rsplit('@', 1)[-1].lower()
+
+
+def media_dir(user):
+    """ returns the folder mastodon-archive downloads the media of an account to
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+
+    Returns:
+        str: the folder, ie. 'mastodon.social.user.myname'
+    """
+    username, domain = user.rsplit('@', 1)
+    return f'{domain}.user.{username}'
+
+
+def secret_files(user):
+    """ returns the secret files mastodon-archive saves when an account is authorized
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+
+    Returns:
+        list: the client secret and the user secret, ie. 'mastodon.social.client.secret' and 'mastodon.social.user.myname.secret'
+    """
+    username, domain = user.rsplit('@', 1)
+    return [f'{domain}.client.secret', f'{domain}.user.{username}.secret']
+
+
+def last_status_id(user):
+    """ returns the id of the newest status in the archive of an account
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+
+    Returns:
+        str: the status id, None when there is no archive (yet)
+    """
+    try:
+        with open(media_dir(user) + '.json', 'r', encoding='utf8') as archive_file:
+            statuses = json.load(archive_file).get('statuses', [])
+    except (OSError, ValueError):
+        return None
+    # Status ids are numeric strings that grow over time
+    return max((str(status['id']) for status in statuses if 'id' in status), key=lambda status_id: (len(status_id), status_id), default=None)
+
+
+def folder_size(folder):
+    """ returns the size of all files in a folder (recursive)
+
+    Args:
+        folder (str): the folder
+
+    Returns:
+        int: the size in bytes, 0 when the folder does not exist
+    """
+    size = 0
+    for root, _, files in os.walk(folder):
+        for file_name in files:
+            try:
+                size += os.lstat(os.path.join(root, file_name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def file_sha256(file_path):
+    """ returns the sha256 of a file
+
+    Args:
+        file_path (str): the file
+
+    Returns:
+        str: the hex digest
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as media_file:
+        for chunk in iter(lambda: media_file.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def dedupe_media(folder, store_dir):
+    """ moves the media of a folder into the content-addressed store, replacing duplicates by hardlinks to the stored blob
+
+    Files that already have more than one link are in the store (of a previous run) and are not hashed again.
+    Empty files (like the '.missing' markers of mastodon-archive) are left alone.
+
+    Args:
+        folder (str): the media folder of an account
+        store_dir (str): the content-addressed store, blobs are saved as '<sha256[:2]>/<sha256>'
+
+    Returns:
+        dict: 'stored' (new blobs), 'linked' (duplicates replaced by a hardlink), 'bytes_saved' and 'failed' (files that could not be linked)
+    """
+    stats = {'stored': 0, 'linked': 0, 'bytes_saved': 0, 'failed': 0}
+    for root, _, files in os.walk(folder):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            try:
+                file_stat = os.lstat(file_path)
+                if not os.path.isfile(file_path) or file_stat.st_nlink > 1 or file_stat.st_size == 0:
+                    continue
+                digest = file_sha256(file_path)
+                blob_path = os.path.join(store_dir, digest[:2], digest)
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                try:
+                    os.link(file_path, blob_path)
+                    stats['stored'] += 1
+                    continue
+                except FileExistsError:
+                    pass
+                # Another collection or account has the same file, link to the stored blob instead
+                temp_path = file_path + '.dedupe'
+                os.link(blob_path, temp_path)
+                os.replace(temp_path, file_path)
+                stats['linked'] += 1
+                stats['bytes_saved'] += file_stat.st_size
+            except OSError:
+                # ie. the store is on another filesystem, keep the file as it is
+                stats['failed'] += 1
+    return stats
+
+
+def media_urls(user):
+    """ returns the urls of the media mastodon-archive downloads for the archive of an account
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+
+    Returns:
+        dict: path of the file in the media folder to the url, empty when there is no archive (yet)
+    """
+    try:
+        with open(media_dir(user) + '.json', 'r', encoding='utf8') as archive_file:
+            archive = json.load(archive_file)
+    except (OSError, ValueError):
+        return {}
+    urls = {}
+    for collection in ('statuses', 'favourites', 'bookmarks'):
+        for status in archive.get(collection) or []:
+            # Same selection as 'mastodon-archive media': the attachments of the boosted status, the preview and the original
+            attachments = (status.get('reblog') or status).get('media_attachments') or []
+            for attachment in attachments:
+                for url in (attachment.get('preview_url'), attachment.get('url')):
+                    if url:
+                        urls[os.path.join(media_dir(user), urllib.parse.urlparse(url).path.lstrip('/'))] = url
+    return urls
+
+
+def url_index_path(store_dir, url):
+    """ returns the path of a url in the index of the media store
+
+    Args:
+        store_dir (str): the content-addressed store
+        url (str): the url of the media file
+
+    Returns:
+        str: the path, ie. '<store_dir>/urls/files.mastodon.social/media_attachments/files/1/original/a.png'
+    """
+    parsed_url = urllib.parse.urlparse(url)
+    return os.path.join(store_dir, 'urls', parsed_url.netloc.lower(), parsed_url.path.lstrip('/'))
+
+
+def seed_media(user, store_dir):
+    """ hardlinks the media of the archive of an account that are in the store into its media folder, so they are not downloaded again
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+        store_dir (str): the content-addressed store
+
+    Returns:
+        dict: 'seeded' (files linked from the store) and 'bytes_seeded'
+    """
+    stats = {'seeded': 0, 'bytes_seeded': 0}
+    for file_path, url in media_urls(user).items():
+        index_path = url_index_path(store_dir, url)
+        if os.path.exists(file_path) or not os.path.isfile(index_path):
+            continue
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.link(index_path, file_path)
+        except OSError:
+            # ie. the store is on another filesystem, mastodon-archive downloads the file
+            continue
+        stats['seeded'] += 1
+        stats['bytes_seeded'] += os.lstat(file_path).st_size
+    return stats
+
+
+def index_media(user, store_dir):
+    """ adds the stored media of the archive of an account to the url index of the store (see 'seed_media')
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+        store_dir (str): the content-addressed store
+    """
+    for file_path, url in media_urls(user).items():
+        try:
+            # Only files that are hardlinked into the store (see 'dedupe_media') are complete downloads
+            if os.lstat(file_path).st_nlink < 2:
+                continue
+            index_path = url_index_path(store_dir, url)
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            os.link(file_path, index_path)
+        except OSError:
+            # Missing file, already indexed or the store is on another filesystem
+            continue
+
+
+def build_pipeline(user, confirm_cmd):
+    """ returns the phases of the pipeline of an account, in order
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+        confirm_cmd (list): ['--confirmed'] to expire for real, empty for a dry-run
+
+    Returns:
+        list: (phase, commands, remote) tuples, the commands of a phase run one after another and 'remote' phases talk to the instance and count for its limit
+    """
+    return [
+        ('archive', [['mastodon-archive', 'archive', '--with-followers', '--with-following', '--with-mentions', '--pace', user]], True),
+        ('media', [['mastodon-archive', 'media', '--pace', user],
+                   ['mastodon-archive', 'media', '--collection', 'favourites', '--pace', user],
+                   ['mastodon-archive', 'media', '--collection', 'bookmarks', '--pace', user]], True),
+        # BEGIN WARNING: After the following phases have been run in 'confirm' mode, data can not be recovered!
+        # Be patient, expiring statuses can take a LONG time! REF: https://docs.joinmastodon.org/api/rate-limits/#deleting-statuses
+        ('expire statuses', [['mastodon-archive', 'expire', '--older-than', '8', '--collection', 'statuses', '--pace', *confirm_cmd, user]], True),
+        ('expire favourites', [['mastodon-archive', 'expire', '--older-than', '8', '--collection', 'favourites', '--pace', *confirm_cmd, user]], True),
+        ('dismiss notifications', [['mastodon-archive', 'expire', '--older-than', '8', '--collection', 'mentions',
+                                    '--delete-other-notifications', '--pace', *confirm_cmd, user]], True),
+        # END WARNING
+        ('html', [['mastodon-archive', 'html', user]], False),
+        ('report', [['mastodon-archive', 'report', '--newer-than', '8', user]], False)]
+
+
+def run_command(command, log_file):
+    """ runs a command, appending its output to the log of the account
+
+    Args:
+        command (list): the command
+        log_file (file): the log file of the account
+
+    Returns:
+        int: the exit status of the command
+    """
+    header = f"\r\n### {time.strftime('%Y-%m-%d %H:%M:%S')} {' '.join(command)}\r\n"
+    log_file.write(header)
+    log_file.flush()
+    try:
+        return subprocess.run(command, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT, check=False).returncode
+    except OSError as error:
+        log_file.write(f'{error}\r\n')
+        return 127
+
+
+def run_phase(commands, log_file, instance_limit=None):
+    """ runs the commands of a phase one after another
+
+    The media collections of an account write into the same media folder, downloading them at the same time could tear a file
+    that is in more than one collection. The accounts run at the same time (see 'main').
+
+    Args:
+        commands (list): the commands
+        log_file (file): the log file of the account
+        instance_limit (threading.BoundedSemaphore, optional): limit of the instance, taken by every command. Defaults to None (no limit).
+
+    Returns:
+        int: the first non-zero exit status of the commands, 0 when all succeeded
+    """
+    returncodes = []
+    for command in commands:
+        if instance_limit is None:
+            returncodes.append(run_command(command, log_file))
+        else:
+            with instance_limit:
+                returncodes.append(run_command(command, log_file))
+    return next((returncode for returncode in returncodes if returncode != 0), 0)
+
+
+def authorize_accounts(users):
+    """ authorizes the accounts without secret files one at a time on the terminal, before the jobs start
+
+    Args:
+        users (list): the accounts
+
+    Returns:
+        list: the accounts that are not authorized
+    """
+    unauthorized = []
+    for user in users:
+        if all(os.path.exists(file_name) for file_name in secret_files(user)):
+            continue
+        if not sys.stdin.isatty():
+            print(f"[{user}] is not authorized and there is no terminal to answer the authorization prompt, skipping the account."
+                  f" Authorize it once by running: mastodon-archive archive {user}")
+            unauthorized.append(user)
+            continue
+        print(f"\r\n[{user}] is not authorized yet, follow the instructions of mastodon-archive to authorize the account")
+        # Inherits the terminal, so the authorization prompt can be answered
+        returncode = subprocess.run(['mastodon-archive', 'archive', user], check=False).returncode
+        if returncode != 0 or not all(os.path.exists(file_name) for file_name in secret_files(user)):
+            print(f"[{user}] authorization FAILED (exit status {returncode}), skipping the account. Authorize it by running: mastodon-archive archive {user}")
+            unauthorized.append(user)
+    return unauthorized
+
+
+def run_account(user, confirm_cmd, log_dir, instance_limits, media_store, journal):
+    """ runs the pipeline of an account, stopping at the first phase that fails and skipping the phases the journal has as completed
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+        confirm_cmd (list): ['--confirmed'] to expire for real, empty for a dry-run
+        log_dir (str): directory of the log files
+        instance_limits (dict): instance to the semaphore limiting its concurrent phases
+        media_store (str): the content-addressed media store, None to keep the media as downloaded
+        journal (CheckpointJournal): the checkpoint journal
+
+    Returns:
+        dict: 'user', 'log', 'completed' (the phases that succeeded), 'skipped' (the phases completed by a previous run),
+        'failed' (the phase that failed, None when all succeeded), 'media' (download and dedupe statistics) and 'seconds'
+    """
+    result = {'user': user, 'log': os.path.join(log_dir, user.replace('@', '_at_') + '.log'), 'completed': [], 'skipped': [], 'failed': None, 'media': None}
+    mode = 'confirm' if confirm_cmd else 'dry-run'
+    checkpoints = journal.completed(user, mode)
+    start_time = time.perf_counter()
+    with open(result['log'], 'a', encoding='utf8') as log_file:
+        for phase, commands, remote in build_pipeline(user, confirm_cmd):
+            if phase in checkpoints:
+                result['skipped'].append(phase)
+                print(f"[{user}] {phase} skipped, completed at {checkpoints[phase]['time']}"
+                      + (f" (last status id {checkpoints[phase]['last_status_id']})" if checkpoints[phase].get('last_status_id') else ''))
+                continue
+            phase_start_time = time.perf_counter()
+            if phase == 'media':
+                seeded = seed_media(user, media_store) if media_store is not None else {'seeded': 0, 'bytes_seeded': 0}
+                size_before = folder_size(media_dir(user))
+            returncode = run_phase(commands, log_file, instance_limits[account_instance(user)] if remote else None)
+            if phase == 'media':
+                result['media'] = media_statistics(user, size_before, time.perf_counter() - phase_start_time, media_store, seeded, returncode == 0)
+            if returncode != 0:
+                result['failed'] = f'{phase} (exit status {returncode})'
+                print(f'[{user}] {phase} FAILED with exit status {returncode}, skipping the remaining phases. See {result["log"]}')
+                break
+            result['completed'].append(phase)
+            journal.record(user, mode, phase, **({'last_status_id': last_status_id(user)} if phase == 'archive' else {}))
+            print(f'[{user}] {phase} done')
+        else:
+            journal.record(user, mode, 'finished')
+    result['seconds'] = round(time.perf_counter() - start_time, 1)
+    return result
+
+
+def media_statistics(user, size_before, seconds, media_store, seeded, completed):
+    """ deduplicates the downloaded media of an account into the store, indexes them by url and shows the statistics
+
+    Args:
+        user (str): the account, ie. 'myname@mastodon.social'
+        size_before (int): size of the media folder before the download (after seeding) in bytes
+        seconds (float): duration of the download
+        media_store (str): the content-addressed media store, None to skip deduplication
+        seeded (dict): 'seeded' and 'bytes_seeded' (see 'seed_media')
+        completed (bool): the download succeeded, the media of a failed download (possibly partial files) are not stored
+
+    Returns:
+        dict: 'downloaded' (bytes), 'seconds', 'seeded', 'bytes_seeded', 'stored', 'linked', 'bytes_saved' and 'failed'
+    """
+    statistics = {'downloaded': max(0, folder_size(media_dir(user)) - size_before), 'seconds': seconds,
+                  'stored': 0, 'linked': 0, 'bytes_saved': 0, 'failed': 0, **seeded}
+    if media_store is not None and completed:
+        statistics.update(dedupe_media(media_dir(user), media_store))
+        index_media(user, media_store)
+    print(f"[{user}] media: {statistics['downloaded'] / 1e6:.1f} MB downloaded in {seconds:.1f} seconds"
+          f" ({statistics['downloaded'] / 1e6 / max(seconds, 1e-9):.2f} MB/s),"
+          f" {statistics['seeded']} files seeded from the store ({statistics['bytes_seeded'] / 1e6:.1f} MB not downloaded),"
+          f" {statistics['linked']} duplicates linked ({statistics['bytes_saved'] / 1e6:.1f} MB saved), {statistics['stored']} new files stored")
+    return statistics
+
+
 def main(argv):
-    """_summary_
+    """ archives the mastodon accounts of the 'mastodon.json' file
 
     Args:
-        argv (_type_): _description_
+        argv (list): CLI arguments
     """
     # Init Variables
-    help_message: str = 'mastodon_archiver.py OR mastodon_archiver.py --confirm'
-    confirm_cmd: str = ''
+    help_message: str = 'mastodon_archiver.py [-w <workers>] [--restart] OR mastodon_archiver.py --confirm [-w <workers>] [--restart]'
+    confirm_cmd: list = []
+    workers: int | None = None
+    restart: bool = False
 
     # Processing CLI input
     try:
-        opts, args = getopt.getopt(argv,"hc",["help","confirm"])
+        opts, args = getopt.getopt(argv,"hcw:",["help","confirm","workers=","restart"])
     except getopt.GetoptError:
         print(help_message)
         sys.exit(2)
-    if not opts:
+    if not any(opt in ("-c", "--confirm") for opt, _ in opts):
         print("NOTE: Expiring will only do dry-run operations. No data will be changed.")
     for opt, arg in opts:
-        if opt == '-h':
+        if opt in ("-h", "--help"):
             print(help_message)
             sys.exit()
         elif opt in ("-c", "--confirm"):
             print("WARNING: Expiring will execute FOR REAL! Make sure the dry-run produces no errors or terminate now. Data will be cleaned up for your mastodon account.")
-            confirm_cmd = ' --confirmed'
+            confirm_cmd = ['--confirmed']
+        elif opt in ("-w", "--workers"):
+            try:
+                workers = max(1, int(arg))
+            except ValueError:
+                print(help_message)
+                sys.exit(2)
+        elif opt == "--restart":
+            restart = True
 
     # Load JSON settings
     ## Try to find the right path
@@ -100,72 +612,49 @@ def main(argv):
         print(error)
         sys.exit()
 
-    try:
-        cmd = "mastodon-archive -h"
-        os.system(cmd)
-    except Exception as error:
-        print(error)
+    if shutil.which('mastodon-archive') is None:
         print("\r\n\r\nInstall mastodon-archive first. Run: pip install mastodon-archive")
         sys.exit()
 
-    # Archive Mastodon
-    print("\r\nDownload Archive Statuses, Favourites, Mentions")
-    for acc in json_object['accounts']:
-        print(acc)
-        user=acc['user']
-        cmd = f'mastodon-archive archive --with-followers --with-following --with-mentions --pace {user}'
-        os.system(cmd)
-
-    print("\r\nDownload Media")
-    for acc in json_object['accounts']:
-        print(acc)
-        user=acc['user']
-        cmd = f'mastodon-archive media --pace {user}'
-        os.system(cmd)
-        cmd = f'mastodon-archive media --collection favourites --pace {user}'
-        os.system(cmd)
-        cmd = f'mastodon-archive media --collection bookmarks --pace {user}'
-        os.system(cmd)
-
-    # BEGIN WARNING: After the following code has been run in 'confirm' mode, data can not be recovered!
-
-    print('\r\nExpire Statuses')
-    for acc in json_object['accounts']:
-        print(acc)
-        print("\r\nBe patient, this can take a LONG time! REF: https://docs.joinmastodon.org/api/rate-limits/#deleting-statuses")
-        user=acc['user']
-        cmd = f'mastodon-archive expire --older-than 8 --collection statuses --pace {confirm_cmd} {user}' # needs '--confirmed' to work
-        os.system(cmd)
-
-    print("\r\nExpire Favourites")
-    for acc in json_object['accounts']:
-        print(acc)
-        user=acc['user']
-        cmd = f'mastodon-archive expire --older-than 8 --collection favourites --pace{confirm_cmd} {user}' # needs '--confirmed' to work
-        os.system(cmd)
-
-    print("\r\nDismiss Notifications")
-    for acc in json_object['accounts']:
-        print(acc)
-        user=acc['user']
-        cmd = f'mastodon-archive expire --older-than 8 --collection mentions --delete-other-notifications --pace{confirm_cmd} {user}' # needs '--confirmed' to work
-        os.system(cmd)
-
-    # END WARNING
-
-    print("\r\nGenerate HTML")
-    for acc in json_object['accounts']:
-        print(acc)
-        user=acc['user']
-        cmd = f'mastodon-archive html {user}'
-        os.system(cmd)
-
-    print("\r\nShow Statistics")
-    for acc in json_object['accounts']:
-        print(acc)
-        user=acc['user']
-        cmd = f'mastodon-archive report --newer-than 8 {user}'
-        os.system(cmd)
+    users = [acc['user'] for acc in json_object['accounts']]
+    workers = workers if workers is not None else int(json_object.get('workers', DEFAULT_WORKERS))
+    per_instance = max(1, int(json_object.get('per_instance', DEFAULT_PER_INSTANCE)))
+    log_dir = json_object.get('log_dir', DEFAULT_LOG_DIR)
+    os.makedirs(log_dir, exist_ok=True)
+    media_store = json_object.get('media_store', DEFAULT_MEDIA_STORE)
+    journal = CheckpointJournal(json_object.get('journal', DEFAULT_JOURNAL))
+    if restart:
+        for user in users:
+            journal.record(user, 'confirm' if confirm_cmd else 'dry-run', 'restart')
+    instance_limits = {instance: threading.BoundedSemaphore(per_instance) for instance in {account_instance(user) for user in users}}
+
+    # Authorize new accounts on the terminal, the jobs can not answer the authorization prompt
+    start_time = time.perf_counter()
+    unauthorized = authorize_accounts(users)
+    results = [{'user': user, 'log': '-', 'completed': [], 'skipped': [], 'failed': 'authorization', 'media': None, 'seconds': 0.0} for user in unauthorized]
+
+    # Run the pipeline of every account as an independent job
+    authorized = [user for user in users if user not in unauthorized]
+    print(f"\r\nArchiving {len(authorized)} accounts with {workers} workers (at most {per_instance} per instance), logs in '{log_dir}'")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_account, user, confirm_cmd, log_dir, instance_limits, media_store, journal) for user in authorized]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    # Summary
+    print(f"\r\nSummary ({time.perf_counter() - start_time:.1f} seconds)")
+    for result in sorted(results, key=lambda result: result['user']):
+        status = 'OK' if result['failed'] is None else 'FAILED at ' + result['failed']
+        print(f"{result['user']}: {status}, {len(result['completed'])} phases in {result['seconds']} seconds"
+              + (f" ({len(result['skipped'])} phases resumed from the journal)" if result['skipped'] else '') + f", log: {result['log']}")
+    media_results = [result['media'] for result in results if result['media'] is not None]
+    if media_results:
+        print(f"Media: {sum(media['downloaded'] for media in media_results) / 1e6:.1f} MB downloaded,"
+              f" {sum(media['bytes_seeded'] for media in media_results) / 1e6:.1f} MB seeded from the store,"
+              f" {sum(media['linked'] for media in media_results)} duplicates linked,"
+              f" {sum(media['bytes_saved'] for media in media_results) / 1e6:.1f} MB saved in '{media_store}'")
+    if any(result['failed'] is not None for result in results):
+        sys.exit(1)
 
 
 # Start main thread